@@ -1,9 +1,17 @@
 from autogen import config_list_from_json
+import logging
 import random 
 
+try:
+    config_list = config_list_from_json("llm_config.json")
+except FileNotFoundError:
+    # Sessions driven by a local model client (e.g. agents.mock_llm) pass their own llm_config
+    logging.warning("llm_config.json not found, gpt4_config has an empty config_list.")
+    config_list = []
+
 gpt4_config = {
     "cache_seed": random.randint(0, 9999999999999999),
     "temperature": 0,
-    "config_list": config_list_from_json("llm_config.json"),
+    "config_list": config_list,
     "timeout": 120,
-}
\ No newline at end of file
+}
@@ -0,0 +1,229 @@
+import argparse
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from autogen import OpenAIWrapper
+from maze.models.maze import Maze
+
+
+##########################################
+# Offline Lore-driven Content Generation #
+##########################################
+
+ITEM_PROMPT = """You are writing content for a maze adventure. Stay true to the lore below.
+For each item, write a one sentence description and a short inspection detail that hints at the lore.
+Reply with only a JSON object mapping each item id to {{"description": "...", "inspection_detail": "..."}}.
+
+Lore:
+{lore}
+
+Items:
+{slots}
+"""
+
+ACTIVITY_PROMPT = """You are writing content for a maze adventure. Stay true to the lore below.
+For each activity, rewrite its description as one sentence that fits the lore.
+Reply with only a JSON object mapping each activity id to {{"description": "..."}}.
+
+Lore:
+{lore}
+
+Activities:
+{slots}
+"""
+
+NPC_PROMPT = """You are writing characters for a maze adventure. Stay true to the lore below.
+For each character slot, invent a character found at that spot of the maze: a name, a one sentence backstory,
+a short system message describing how they speak, and three lines of dialogue they reveal one by one.
+Reply with only a JSON object mapping each slot id to
+{{"name": "...", "system_message": "...", "backstory": "...", "dialogues": ["...", "...", "..."]}}.
+
+Lore:
+{lore}
+
+Character slots:
+{slots}
+"""
+
+PROMPTS = {"item": ITEM_PROMPT, "activity": ACTIVITY_PROMPT, "npc": NPC_PROMPT}
+
+# The fields every generated slot must have, per template, and their types
+SLOT_FIELDS = {
+    "item": {"description": str, "inspection_detail": str},
+    "activity": {"description": str},
+    "npc": {"name": str, "system_message": str, "backstory": str, "dialogues": list},
+}
+
+
+def valid_slot(template, value):
+    """Check a generated slot has the fields its template asks for, with the right types."""
+    if not isinstance(value, dict):
+        return False
+    for field, kind in SLOT_FIELDS[template].items():
+        if not isinstance(value.get(field), kind):
+            return False
+    if template == "npc" and not all(isinstance(line, str) for line in value["dialogues"]):
+        return False
+    return True
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+class ContentCache:
+    """
+    SQLite cache of generated content keyed by (lore hash, template, slot).
+
+    The template key includes a hash of the prompt, so editing a prompt
+    invalidates exactly the content it produced.
+    """
+    def __init__(self, path="lore_cache.sqlite"):
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS content ("
+                "lore_hash TEXT, template TEXT, slot TEXT, value TEXT, PRIMARY KEY (lore_hash, template, slot))"
+            )
+
+    def get_many(self, lore_hash, template, slots):
+        with self.lock:
+            rows = self.connection.execute(
+                f"SELECT slot, value FROM content WHERE lore_hash = ? AND template = ? AND slot IN ({','.join('?' * len(slots))})",
+                [lore_hash, template, *slots],
+            ).fetchall()
+        return {slot: json.loads(value) for slot, value in rows}
+
+    def put_many(self, lore_hash, template, values):
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO content VALUES (?, ?, ?, ?)",
+                [(lore_hash, template, slot, json.dumps(value)) for slot, value in values.items()],
+            )
+
+
+def parse_json_object(text):
+    """Pull the JSON object out of a completion, ignoring code fences or chatter around it."""
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end <= start:
+        raise ValueError("No JSON object in completion.")
+    return json.loads(text[start:end + 1])
+
+
+class LoreContentPipeline:
+    """
+    Generates lore-driven content for a populated maze ahead of time.
+
+    Slots (item templates, activity templates, NPC spawn points) are grouped
+    per prompt template into batches of `batch_size`, so one completion
+    writes many slots, and at most `max_concurrency` completions run at once.
+    Results are cached per slot, so re-running with the same lore only asks
+    for what is missing. The output is a content pack for maze.content.
+
+    Attributes:
+        lore (str): The lore document the content is based on.
+        complete (Callable[[str], str]): Turns a prompt into a completion.
+        cache (ContentCache): Generated content per (lore hash, template, slot).
+    """
+    def __init__(self, lore, complete, cache=None, batch_size=8, max_concurrency=4):
+        self.lore = lore
+        self.lore_hash = text_hash(lore)
+        self.complete = complete
+        self.cache = cache or ContentCache()
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.completions = 0
+
+    @classmethod
+    def from_llm_config(cls, lore, llm_config, **kwargs):
+        """Build a pipeline that completes prompts through autogen's OpenAIWrapper."""
+        client = OpenAIWrapper(**{k: v for k, v in llm_config.items() if k != "cache_seed"})
+
+        def complete(prompt):
+            response = client.create(messages=[{"role": "user", "content": prompt}], cache_seed=None)
+            return client.extract_text_or_completion_object(response)[0]
+
+        return cls(lore, complete, **kwargs)
+
+    def slots(self, maze: Maze, npc_count):
+        """Describe every slot to fill, as {template: {slot id: prompt line}}."""
+        spawn_points = maze.npc_spawn_points if maze.npc_spawn_points is not None else []
+        return {
+            "item": {template.name: f"- {template.name}: {template.description}" for template in maze.item_templates},
+            "activity": {template.description: f"- {template.description}" for template in maze.activity_templates},
+            "npc": {
+                f"npc-{index}": f"- npc-{index}: standing at ({x}, {y})"
+                for index, (x, y) in enumerate(spawn_points[:npc_count])
+            },
+        }
+
+    def _generate_batch(self, template, template_key, batch):
+        prompt = PROMPTS[template].format(lore=self.lore, slots="\n".join(batch.values()))
+        try:
+            generated = parse_json_object(self.complete(prompt))
+        except ValueError as e:
+            logging.error(f"Discarding {template} batch of {len(batch)} slots: {e}")
+            return {}
+        self.completions += 1
+        values = {slot: generated[slot] for slot in batch if slot in generated and valid_slot(template, generated[slot])}
+        if len(values) < len(batch):
+            # Left out of the cache, so the next run asks for them again
+            logging.error(f"Discarding {len(batch) - len(values)} missing or malformed {template} slots of a batch")
+        self.cache.put_many(self.lore_hash, template_key, values)
+        return values
+
+    def generate(self, maze: Maze, npc_count=8):
+        """Fill every slot of the maze, from the cache where possible, and return a content pack."""
+        results = {}
+        futures = []
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            for template, slots in self.slots(maze, npc_count).items():
+                template_key = f"{template}:{text_hash(PROMPTS[template])}"
+                cached = self.cache.get_many(self.lore_hash, template_key, list(slots)) if slots else {}
+                results[template] = {slot: value for slot, value in cached.items() if valid_slot(template, value)}
+                missing = [slot for slot in slots if slot not in results[template]]
+                for start in range(0, len(missing), self.batch_size):
+                    batch = {slot: slots[slot] for slot in missing[start:start + self.batch_size]}
+                    futures.append((template, executor.submit(self._generate_batch, template, template_key, batch)))
+            for template, future in futures:
+                results[template].update(future.result())
+
+        npcs = [results["npc"][slot] for slot in sorted(results["npc"], key=lambda slot: int(slot.split("-")[1]))]
+        logging.info(f"Generated content with {self.completions} completions")
+        return {
+            "lore_hash": self.lore_hash,
+            "items": results["item"],
+            "activities": results["activity"],
+            "npcs": npcs,
+        }
+
+    @staticmethod
+    def write(pack, path):
+        with open(path, "w") as f:
+            json.dump(pack, f, indent=2)
+
+
+if __name__ == "__main__":
+    from agents.config import gpt4_config
+    from maze.population import populate_maze
+
+    parser = argparse.ArgumentParser(description="Generate a lore-driven content pack for populated mazes.")
+    parser.add_argument("lore", help="Path to the lore document.")
+    parser.add_argument("output", help="Where to write the content pack (JSON).")
+    parser.add_argument("--npcs", type=int, default=8, help="Number of NPCs to write.")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--max-concurrency", type=int, default=4)
+    parser.add_argument("--cache", default="lore_cache.sqlite")
+    args = parser.parse_args()
+
+    with open(args.lore, "r") as f:
+        lore = f.read()
+    maze = populate_maze(Maze(10, 10), npc_spawn_probability=1.0)
+    pipeline = LoreContentPipeline.from_llm_config(lore, gpt4_config, cache=ContentCache(args.cache),
+                                                   batch_size=args.batch_size, max_concurrency=args.max_concurrency)
+    LoreContentPipeline.write(pipeline.generate(maze, npc_count=args.npcs), args.output)
@@ -0,0 +1,187 @@
+import json
+import os
+import sqlite3
+import weakref
+
+
+########################################
+# Bounded Chat History with Disk Spill #
+########################################
+
+class SharedContent(str):
+    """A message content string that can be weakly referenced (a plain str can't), see ContentInterner."""
+
+
+class ContentInterner:
+    """
+    Makes equal message contents one shared string.
+
+    A group chat message is broadcast to every agent, and each agent keeps
+    its own message dict for it; interning makes all of those dicts point at
+    the same content string. Contents are only held weakly, so a content is
+    forgotten once every in-memory history holding it has spilled it.
+    """
+    def __init__(self):
+        # hash(content) -> SharedContent; keyed by hash so the key doesn't keep the content alive
+        self.contents = weakref.WeakValueDictionary()
+
+    def __call__(self, message):
+        content = message.get("content") if isinstance(message, dict) else None
+        if not isinstance(content, str):
+            return message
+        key = hash(content)
+        shared = self.contents.get(key)
+        if shared is None or shared != content:
+            # A hash collision just replaces the older content, which then stops being shared
+            shared = content if type(content) is SharedContent else SharedContent(content)
+            self.contents[key] = shared
+        message["content"] = shared
+        return message
+
+
+class MessageStore:
+    """
+    Append-only SQLite store for the chat history spilled out of memory by one session.
+
+    Every distinct content is written once and referenced by the messages
+    that carry it, so a message broadcast to every agent costs one copy of
+    its content on disk as well. A connection is only opened while reading
+    or writing, so idle sessions hold no file handles.
+
+    Attributes:
+        path (str): The SQLite file.
+    """
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS contents (id INTEGER PRIMARY KEY, content TEXT UNIQUE)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS messages (conversation TEXT, seq INTEGER, message TEXT, content_id INTEGER,"
+                " PRIMARY KEY (conversation, seq))"
+            )
+
+    @staticmethod
+    def session_path(directory, session_id):
+        return os.path.join(directory, f"{session_id}.sqlite")
+
+    def _connect(self):
+        return sqlite3.connect(self.path)
+
+    def spill(self, conversation, seq, messages):
+        """Append `messages` to a conversation, the first one at absolute position `seq`."""
+        with self._connect() as conn:
+            rows = []
+            for offset, message in enumerate(messages):
+                message = dict(message)
+                content = message.pop("content", None)
+                content_id = None
+                if isinstance(content, str):
+                    conn.execute("INSERT OR IGNORE INTO contents (content) VALUES (?)", (content,))
+                    content_id = conn.execute("SELECT id FROM contents WHERE content = ?", (content,)).fetchone()[0]
+                else:
+                    message["content"] = content
+                rows.append((conversation, seq + offset, json.dumps(message, default=str), content_id))
+            conn.executemany("INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?)", rows)
+
+    def page(self, conversation, start, stop):
+        """The spilled messages of a conversation from absolute position `start` up to `stop`."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT message, content FROM messages LEFT JOIN contents ON contents.id = messages.content_id"
+                " WHERE conversation = ? AND seq >= ? AND seq < ? ORDER BY seq",
+                (conversation, start, stop),
+            ).fetchall()
+        messages = []
+        for message, content in rows:
+            message = json.loads(message)
+            if content is not None:
+                message["content"] = content
+            messages.append(message)
+        return messages
+
+    def delete(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class BoundedHistory(list):
+    """
+    A chat history list that keeps only its most recent `window` messages in memory.
+
+    It replaces the message lists autogen keeps per conversation (an agent's
+    `chat_messages[peer]`, `GroupChat.messages`), so the agents and autogen
+    see a normal list holding the recent window. Once the list grows past
+    `window` the oldest messages (a quarter window at a time) are appended
+    to the MessageStore, never leaving tool results at the start of the
+    window without the tool call they answer. `page` reads the whole history
+    back by absolute position. Without a store nothing is spilled.
+
+    Attributes:
+        conversation (str): Key of this history in the store.
+        offset (int): Number of messages spilled, the absolute position of the first message in memory.
+    """
+    def __init__(self, conversation, store: MessageStore = None, window=None, interner=None, messages=(), offset=0):
+        super().__init__()
+        self.conversation = conversation
+        self.store = store
+        self.window = window if store is not None else None
+        self.interner = interner
+        self.offset = offset
+        self.extend(messages)
+
+    def append(self, message):
+        super().append(self.interner(message) if self.interner else message)
+        if self.window is not None and len(self) > self.window:
+            self._spill()
+
+    def extend(self, messages):
+        for message in messages:
+            self.append(message)
+
+    def _spill(self):
+        cut = min(len(self) - self.window + self.window // 4, len(self) - 1)
+        while cut < len(self) - 1 and isinstance(self[cut], dict) and self[cut].get("role") == "tool":
+            cut += 1
+        self.store.spill(self.conversation, self.offset, self[:cut])
+        del self[:cut]
+        self.offset += cut
+
+    @property
+    def total(self):
+        """Number of messages in the whole history, spilled or not."""
+        return self.offset + len(self)
+
+    def page(self, start=0, stop=None):
+        """Messages from absolute position `start` up to `stop` (the end by default), read from disk where spilled."""
+        stop = self.total if stop is None else min(stop, self.total)
+        start = max(start, 0)
+        spilled = self.store.page(self.conversation, start, min(stop, self.offset)) if start < self.offset else []
+        return spilled + list(self[max(start - self.offset, 0):max(stop - self.offset, 0)])
+
+    def saved(self):
+        """What `dehydrate` keeps of this history; the spilled part stays in the store."""
+        return {"offset": self.offset, "messages": list(self)}
+
+    def __reduce__(self):
+        # Pickles (e.g. deep copies) as a plain list of the messages in memory
+        return list, (list(self),)
+
+
+class HistoryMap(dict):
+    """An agent's `chat_messages` (peer agent -> history) that creates a BoundedHistory per peer on first use."""
+    def __init__(self, owner, store=None, window=None, interner=None):
+        super().__init__()
+        self.owner = owner
+        self.store = store
+        self.window = window
+        self.interner = interner
+
+    def history(self, peer_name, saved=None):
+        saved = saved if isinstance(saved, dict) else {"messages": saved or [], "offset": 0}
+        return BoundedHistory(f"{self.owner}:{peer_name}", self.store, self.window, self.interner,
+                              messages=saved["messages"], offset=saved["offset"])
+
+    def __missing__(self, peer):
+        self[peer] = history = self.history(peer.name)
+        return history
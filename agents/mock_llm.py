@@ -0,0 +1,93 @@
+import json
+import time
+import uuid
+
+from openai.types.chat import ChatCompletion
+
+
+###################################
+# Local Mock LLM for Offline Runs #
+###################################
+
+# Words that make the mock model call the move_player tool with that direction
+DIRECTIONS = ("north", "south", "east", "west", "up", "down", "left", "right")
+
+MOCK_LLM_CONFIG = {
+    "config_list": [{"model": "mock", "model_client_cls": "MockModelClient"}],
+    "cache_seed": None,
+    "temperature": 0,
+}
+
+
+class MockModelClient:
+    """
+    Deterministic autogen ModelClient that never leaves the process.
+
+    It answers a direction ("go north") with a `move_player` tool call, other
+    known tool names with a call to that tool, a tool result by repeating it,
+    and anything else with a short canned reply. It is meant for load and
+    latency testing of the framework side of a session, with `latency`
+    seconds of simulated network time per completion.
+    """
+    def __init__(self, config, latency=0.0, **kwargs):
+        self.model = config.get("model", "mock")
+        self.latency = latency
+
+    def create(self, params):
+        if self.latency:
+            time.sleep(self.latency)
+        last = params["messages"][-1]
+        content = last.get("content") or ""
+        tools = {tool["function"]["name"] for tool in params.get("tools", [])}
+        message = {"role": "assistant", "content": None}
+
+        words = content.lower().replace(",", " ").replace(".", " ").split()
+        direction = next((word for word in words if word in DIRECTIONS), None)
+        tool = next((word for word in words if word in tools), None)
+        if last.get("role") == "tool":
+            message["content"] = content
+        elif direction and "move_player" in tools:
+            message["tool_calls"] = [self._tool_call("move_player", {"direction": direction})]
+        elif tool:
+            message["tool_calls"] = [self._tool_call(tool, {})]
+        else:
+            message["content"] = f"I hear you: {content[:200]}"
+
+        prompt_tokens = sum(len(str(m.get("content") or "")) for m in params["messages"]) // 4
+        completion_tokens = len(message["content"] or "") // 4
+        return ChatCompletion.model_validate({
+            "id": f"mock-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": self.model,
+            "choices": [{"index": 0, "finish_reason": "stop", "message": message}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+
+    @staticmethod
+    def _tool_call(name, arguments):
+        return {"id": f"call_{uuid.uuid4().hex[:12]}", "type": "function",
+                "function": {"name": name, "arguments": json.dumps(arguments)}}
+
+    def message_retrieval(self, response):
+        return [
+            choice.message if choice.message.tool_calls is not None else choice.message.content
+            for choice in response.choices
+        ]
+
+    def cost(self, response):
+        return 0.0
+
+    @staticmethod
+    def get_usage(response):
+        return {
+            "prompt_tokens": response.usage.prompt_tokens,
+            "completion_tokens": response.usage.completion_tokens,
+            "total_tokens": response.usage.total_tokens,
+            "cost": 0.0,
+            "model": response.model,
+        }
@@ -13,6 +13,7 @@ class NPC(ConversableAgent):
         self.dialogues = dialogues
         self.dialogue_index = 0
         self.explorer = explorer  # Add explorer as an attribute
+        self.event_log = None  # GameEventLog recording dialogue progress, set by the maze controller
 
     def send_initial_greeting(self):
         # Send initial greeting to the explorer
@@ -22,6 +23,8 @@ class NPC(ConversableAgent):
         if self.dialogue_index < len(self.dialogues):
             self.send(self.dialogues[self.dialogue_index], self.explorer)
             self.dialogue_index += 1
+            if self.event_log is not None:
+                self.event_log.append("d", self.name, self.dialogue_index)
         else:
             self.send("I have told you all I know.", self.explorer)
 
@@ -0,0 +1,191 @@
+import cProfile
+import functools
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+
+###########################
+# Per-turn Turn Profiling #
+###########################
+
+class StackSampler:
+    """
+    Periodically samples the call stack of one thread and aggregates the
+    samples as collapsed stacks ("frame;frame;frame count"), the input format
+    of flamegraph.pl and speedscope.
+    """
+    def __init__(self, thread_id, interval=0.001):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="turn-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.samples[";".join(reversed(stack))] += 1
+
+    def collapsed(self):
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.items()) + "\n"
+
+
+class TurnProfiler:
+    """
+    Profiles single turns of one session.
+
+    A turn is one whole player exchange (SaturnChatApp.handle_message), so a
+    profile covers autogen's message handling in GroupChatManager.run_chat
+    (broadcasting, speaker selection, history spills) as well as every agent
+    reply in it. `instrument` gives each agent's replies a frame named after
+    the agent, so LLM reply generation (including time spent waiting on the
+    network) and tool execution against the maze show up per agent inside the
+    turn. Output files are tagged with the session and turn IDs.
+
+    Profiling is switched on for the whole session (`enabled`), for a random
+    fraction of turns (`sample_rate`), or at runtime through a control file
+    listing session IDs (or "*" for all), so a worker never has to be
+    restarted to start capturing.
+
+    Attributes:
+        session_id (str): The session the profiles are tagged with.
+        output_dir (str): Directory the profiles are written to.
+        enabled (bool): Profile every turn of this session.
+        sample_rate (float): Fraction of turns profiled when not enabled.
+        output_format (str): "collapsed" for sampled flamegraph stacks, "pstats" for cProfile stats.
+        interval (float): Sampling interval in seconds for the collapsed format.
+        control_file (str): Optional file checked each turn for session IDs to profile.
+    """
+    FORMATS = ("collapsed", "pstats")
+
+    def __init__(self, session_id, output_dir="./profiles", enabled=False, sample_rate=0.0,
+                 output_format="collapsed", interval=0.001, control_file=None):
+        if output_format not in self.FORMATS:
+            raise ValueError(f"Unknown profile format '{output_format}', expected one of {self.FORMATS}.")
+        self.session_id = session_id
+        self.output_dir = output_dir
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.output_format = output_format
+        self.interval = interval
+        self.control_file = control_file
+        self.turn_id = 0
+        self._active = False
+        self._control_mtime = None
+        self._control_sessions = set()
+
+    @classmethod
+    def from_env(cls, session_id):
+        """
+        Build a profiler from the environment:
+        SATURN_PROFILE (comma separated session IDs, or "*"), SATURN_PROFILE_SAMPLE_RATE,
+        SATURN_PROFILE_DIR, SATURN_PROFILE_FORMAT and SATURN_PROFILE_CONTROL.
+        """
+        sessions = {s.strip() for s in os.getenv("SATURN_PROFILE", "").split(",") if s.strip()}
+        return cls(
+            session_id,
+            output_dir=os.getenv("SATURN_PROFILE_DIR", "./profiles"),
+            enabled="*" in sessions or session_id in sessions,
+            sample_rate=float(os.getenv("SATURN_PROFILE_SAMPLE_RATE", "0")),
+            output_format=os.getenv("SATURN_PROFILE_FORMAT", "collapsed"),
+            control_file=os.getenv("SATURN_PROFILE_CONTROL"),
+        )
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def should_profile(self):
+        """Decide whether the next turn is captured."""
+        if self.enabled or self._enabled_by_control_file():
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _enabled_by_control_file(self):
+        if not self.control_file:
+            return False
+        try:
+            mtime = os.path.getmtime(self.control_file)
+        except OSError:
+            return False
+        if mtime != self._control_mtime:
+            with open(self.control_file, "r") as f:
+                self._control_sessions = {line.strip() for line in f if line.strip()}
+            self._control_mtime = mtime
+        return "*" in self._control_sessions or self.session_id in self._control_sessions
+
+    @contextmanager
+    def profile_turn(self, label="turn"):
+        """Profile the enclosed block as one turn. Nested turns are folded into the outer one."""
+        if self._active:
+            yield None
+            return
+        self.turn_id += 1
+        if not self.should_profile():
+            yield None
+            return
+
+        self._active = True
+        path = os.path.join(self.output_dir, f"{self.session_id}-turn{self.turn_id:05d}-{label}")
+        started = time.perf_counter()
+        if self.output_format == "pstats":
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            profiler = StackSampler(threading.get_ident(), self.interval)
+            profiler.start()
+        try:
+            yield path
+        finally:
+            elapsed = time.perf_counter() - started
+            os.makedirs(self.output_dir, exist_ok=True)
+            if self.output_format == "pstats":
+                profiler.disable()
+                path += ".pstats"
+                profiler.dump_stats(path)
+            else:
+                profiler.stop()
+                path += ".collapsed"
+                with open(path, "w") as f:
+                    f.write(profiler.collapsed())
+            self._active = False
+            logging.warning(f"Profiled session {self.session_id} turn {self.turn_id} ({label}) in {elapsed:.3f}s -> {path}")
+
+    @staticmethod
+    def instrument(*agents):
+        """Wrap each agent's `generate_reply` in a frame named "<agent>.generate_reply", the agent's label in profiles."""
+        for agent in agents:
+            generate_reply = agent.generate_reply
+
+            @functools.wraps(generate_reply)
+            def labelled_generate_reply(*args, _generate_reply=generate_reply, **kwargs):
+                return _generate_reply(*args, **kwargs)
+
+            # Both output formats name frames by their code object, so each agent gets its own
+            labelled_generate_reply.__code__ = labelled_generate_reply.__code__.replace(
+                co_name=f"{agent.name}.generate_reply")
+            agent.generate_reply = labelled_generate_reply
@@ -0,0 +1,263 @@
+import argparse
+import functools
+import json
+import logging
+import random
+import statistics
+import time
+import tracemalloc
+from collections import deque
+
+from openai.types.chat import ChatCompletion
+
+from agents.mock_llm import MOCK_LLM_CONFIG, MockModelClient
+from simple_universe import SaturnChatApp
+
+
+##########################################
+# Record/Replay of Conversation Sessions #
+##########################################
+
+# A transcript file is JSON: {"version", "seed", "session_id", "max_rounds", "turns": [...]}, where each turn
+# holds the player message, the LLM completions made during it ({"agent", "request", "response"}) in call
+# order, and the tool calls the explorer executed ({"name", "arguments", "result"}).
+TRANSCRIPT_VERSION = 1
+
+REPLAY_LLM_CONFIG = {
+    "config_list": [{"model": "replay", "model_client_cls": "ReplayModelClient"}],
+    "cache_seed": None,
+    "temperature": 0,
+}
+
+
+def llm_agents(app: SaturnChatApp):
+    return [app.saturnbot, app.guardian_npc]
+
+
+def as_json(value):
+    """Tool results as they compare after a JSON round trip (tuples become lists)."""
+    return json.loads(json.dumps(value, default=str))
+
+
+class SessionRecorder:
+    """
+    Records a SaturnChatApp session as a transcript for deterministic replay.
+
+    Every completion returned to an LLM-backed agent (whether it came from the
+    API or autogen's cache) is captured with the request that produced it, and
+    every tool the explorer executes is captured with its arguments and result.
+    The maze is made reproducible by seeding the random module before the app
+    (and its maze) is built.
+    """
+    def __init__(self, seed=0, session_id="replay", max_rounds=8, **app_kwargs):
+        self.seed = seed
+        self.session_id = session_id
+        self.max_rounds = max_rounds
+        random.seed(seed)
+        self.app = SaturnChatApp(session_id=session_id, interactive=False, **app_kwargs)
+        self.turns = []
+        for agent in llm_agents(self.app):
+            agent.client.create = self._record_completion(agent.name, agent.client.create)
+        function_map = self.app.explorer._function_map
+        for name, function in function_map.items():
+            function_map[name] = self._record_tool(name, function)
+
+    def _record_completion(self, agent_name, create):
+        @functools.wraps(create)
+        def record(**params):
+            response = create(**params)
+            self.turns[-1]["completions"].append({
+                "agent": agent_name,
+                "request": json.loads(json.dumps(params, default=str)),
+                # OpenAIWrapper attaches the client's message_retrieval method to its responses
+                "response": response.model_dump(mode="json", exclude={"message_retrieval_function"}),
+            })
+            return response
+        return record
+
+    def _record_tool(self, name, function):
+        @functools.wraps(function)
+        def record(**arguments):
+            result = function(**arguments)
+            self.turns[-1]["tools"].append({"name": name, "arguments": arguments, "result": as_json(result)})
+            return result
+        return record
+
+    def send(self, message):
+        """Drive one exchange of the session, recording it as a turn. Returns the messages it produced."""
+        self.turns.append({"message": message, "completions": [], "tools": []})
+        return self.app.handle_message(message, max_rounds=self.max_rounds)
+
+    def transcript(self):
+        return {"version": TRANSCRIPT_VERSION, "seed": self.seed, "session_id": self.session_id,
+                "max_rounds": self.max_rounds, "turns": self.turns}
+
+    def write(self, path):
+        with open(path, "w") as f:
+            json.dump(self.transcript(), f, indent=1)
+
+
+class ReplayModelClient(MockModelClient):
+    """
+    autogen ModelClient serving the completions of a recorded transcript in call order.
+
+    A request whose message count differs from the recorded one means the
+    session took a different path than when it was recorded; it is counted
+    in `mismatches` and the next recorded completion is served anyway.
+    """
+    def __init__(self, config, completions: deque, mismatches: list, **kwargs):
+        super().__init__(config)
+        self.completions = completions
+        self.mismatches = mismatches
+
+    def create(self, params):
+        if not self.completions:
+            raise RuntimeError("The session asked for more completions than the transcript recorded.")
+        completion = self.completions.popleft()
+        if len(params["messages"]) != len(completion["request"]["messages"]):
+            self.mismatches.append(("completion", completion["agent"], len(params["messages"]),
+                                    len(completion["request"]["messages"])))
+        return ChatCompletion.model_validate(completion["response"])
+
+    def cost(self, response):
+        return getattr(response, "cost", 0.0) or 0.0
+
+
+def replay(transcript, measure_memory=False):
+    """
+    Re-run a recorded session offline: the recorded completions are served to
+    the real autogen agents and the tools run against a real MazeController
+    built from the recorded seed. Returns per-turn latencies (and, with
+    `measure_memory`, tracemalloc peaks) plus any divergence from the recording.
+    """
+    completions = deque(completion for turn in transcript["turns"] for completion in turn["completions"])
+    mismatches = []
+    random.seed(transcript["seed"])
+    app = SaturnChatApp(session_id=transcript["session_id"], interactive=False, llm_config=REPLAY_LLM_CONFIG,
+                        model_client_cls=ReplayModelClient,
+                        model_client_kwargs={"completions": completions, "mismatches": mismatches})
+    expected_tools = deque()
+    function_map = app.explorer._function_map
+    for name, function in function_map.items():
+        function_map[name] = _check_tool(name, function, expected_tools, mismatches)
+
+    latencies, peaks = [], []
+    if measure_memory:
+        tracemalloc.start()
+    try:
+        for turn in transcript["turns"]:
+            expected_tools.clear()
+            expected_tools.extend(turn["tools"])
+            if measure_memory:
+                tracemalloc.reset_peak()
+                baseline = tracemalloc.get_traced_memory()[0]
+            started = time.perf_counter()
+            app.handle_message(turn["message"], max_rounds=transcript["max_rounds"])
+            latencies.append(time.perf_counter() - started)
+            if measure_memory:
+                peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+            if expected_tools:
+                mismatches.append(("tool", "missing", [tool["name"] for tool in expected_tools]))
+    finally:
+        if measure_memory:
+            tracemalloc.stop()
+    if completions:
+        mismatches.append(("completion", "unused", len(completions)))
+    return {"latencies": latencies, "memory_peaks": peaks, "mismatches": mismatches}
+
+
+def _check_tool(name, function, expected_tools, mismatches):
+    @functools.wraps(function)
+    def check(**arguments):
+        result = function(**arguments)
+        expected = expected_tools.popleft() if expected_tools else None
+        if expected is None or expected["name"] != name or expected["result"] != as_json(result):
+            mismatches.append(("tool", name, arguments))
+        return result
+    return check
+
+
+def summarize(result, runs=1):
+    """Median and p95 turn latency in ms, and the largest per-turn memory peak, of one or more replays."""
+    latencies = sorted(result["latencies"])
+    summary = {
+        "turns": len(latencies) // runs,
+        "median_turn_ms": statistics.median(latencies) * 1000,
+        "p95_turn_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+        "mismatches": len(result["mismatches"]),
+    }
+    if result["memory_peaks"]:
+        summary["max_turn_peak_kb"] = max(result["memory_peaks"]) / 1024
+    return summary
+
+
+def benchmark(paths, runs=5, measure_memory=True):
+    """
+    Replay each transcript `runs` times for latency, and once more under
+    tracemalloc for memory, so tracing overhead doesn't skew the latencies.
+    """
+    report = {}
+    for path in paths:
+        with open(path, "r") as f:
+            transcript = json.load(f)
+        if transcript.get("version") != TRANSCRIPT_VERSION:
+            raise ValueError(f"{path} is a version {transcript.get('version')} transcript, expected {TRANSCRIPT_VERSION}.")
+        combined = {"latencies": [], "memory_peaks": [], "mismatches": []}
+        for _ in range(runs):
+            result = replay(transcript)
+            combined["latencies"] += result["latencies"]
+            combined["mismatches"] += result["mismatches"]
+        if measure_memory:
+            combined["memory_peaks"] = replay(transcript, measure_memory=True)["memory_peaks"]
+        if combined["mismatches"]:
+            logging.warning(f"{path} diverged from its recording: {combined['mismatches'][:5]}")
+        report[path] = summarize(combined, runs)
+    return report
+
+
+def compare(baseline, current):
+    """Relative change of every metric of `current` against a `baseline` report, per transcript."""
+    return {
+        path: {
+            metric: (value - baseline[path][metric]) / baseline[path][metric]
+            for metric, value in summary.items()
+            if metric.endswith(("_ms", "_kb")) and baseline[path].get(metric)
+        }
+        for path, summary in current.items()
+        if path in baseline
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record SaturnChatApp sessions and replay them for performance tests.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record = commands.add_parser("record", help="Play a session from player messages (one per line) and record it.")
+    record.add_argument("messages", help="File with one player message per line.")
+    record.add_argument("output", help="Where to write the transcript (JSON).")
+    record.add_argument("--seed", type=int, default=0, help="Seed the maze is built from.")
+    record.add_argument("--max-rounds", type=int, default=8)
+    record.add_argument("--mock", action="store_true", help="Record against the local mock LLM instead of llm_config.json.")
+    play = commands.add_parser("replay", help="Replay transcripts offline and report turn latency and memory.")
+    play.add_argument("transcripts", nargs="+")
+    play.add_argument("--runs", type=int, default=5)
+    play.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc run.")
+    play.add_argument("--output", help="Write the report (JSON) here, e.g. as the baseline for a later version.")
+    play.add_argument("--baseline", help="A report from an earlier version to compare against.")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        app_kwargs = {"llm_config": MOCK_LLM_CONFIG, "model_client_cls": MockModelClient} if args.mock else {}
+        recorder = SessionRecorder(seed=args.seed, max_rounds=args.max_rounds, **app_kwargs)
+        with open(args.messages, "r") as f:
+            for message in filter(None, (line.strip() for line in f)):
+                recorder.send(message)
+        recorder.write(args.output)
+    else:
+        report = benchmark(args.transcripts, runs=args.runs, measure_memory=not args.no_memory)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(report, f, indent=2)
+        if args.baseline:
+            with open(args.baseline, "r") as f:
+                report = {"report": report, "change": compare(json.load(f), report)}
+        print(json.dumps(report, indent=2))
@@ -0,0 +1,83 @@
+import functools
+import json
+import logging
+from collections import defaultdict
+
+
+################################
+# Per-turn Tool Result Budgets #
+################################
+
+@functools.lru_cache(maxsize=None)
+def token_counter(model="gpt-4"):
+    """Return a function counting the tokens of a text with tiktoken, or estimating them (4 characters per token) without it."""
+    try:
+        import tiktoken
+        encoding = tiktoken.encoding_for_model(model)
+    except Exception as e:  # not installed, unknown model, or the encoding could not be downloaded
+        logging.warning(f"Estimating tool result tokens from their length, tiktoken is unavailable: {e}")
+        return lambda text: (len(text) + 3) // 4
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+
+def is_json(text):
+    if text[:1] not in ("{", "["):
+        return False
+    try:
+        json.loads(text)
+    except ValueError:
+        return False
+    return True
+
+
+class ToolResultBudget:
+    """
+    Caps how many tokens of tool results go into the chat per turn.
+
+    Tool results land in the LLM context and are resent on every following
+    turn, so each explorer turn (one reply, possibly executing several tool
+    calls) gets `tokens_per_turn` tokens. A result that doesn't fit in what is
+    left is truncated to it, or replaced by a one-line summary when it is
+    JSON or less than `min_tokens` are left. Token counts are kept per tool.
+
+    Attributes:
+        tokens_per_turn (int): Tokens of tool results allowed per turn.
+        remaining (int): Tokens left in the current turn.
+        stats (dict): Tool name -> calls, tokens produced, tokens sent and results cut.
+    """
+    def __init__(self, tokens_per_turn=500, model="gpt-4", min_tokens=24):
+        self.tokens_per_turn = tokens_per_turn
+        self.min_tokens = min_tokens
+        self.count = token_counter(model)
+        self.remaining = tokens_per_turn
+        self.stats = defaultdict(lambda: {"calls": 0, "tokens": 0, "sent_tokens": 0, "cut": 0})
+
+    def reset(self, recipient=None, messages=None, sender=None, config=None):
+        """Start a new turn. Registered as the explorer's first reply function, it never replies itself."""
+        self.remaining = self.tokens_per_turn
+        return False, None
+
+    def apply(self, tool, result):
+        """Record the tokens of a tool result and return it cut down to what is left of the turn budget."""
+        result = str(result)
+        tokens = self.count(result)
+        stats = self.stats[tool]
+        stats["calls"] += 1
+        stats["tokens"] += tokens
+        if tokens > self.remaining:
+            stats["cut"] += 1
+            marker = f"... [{tool} output cut to fit the turn budget]"
+            room = self.remaining - self.count(marker)
+            if room < self.min_tokens or is_json(result):
+                # Cut JSON (e.g. MazeController.describe_compact) would be broken JSON, so it is summarized instead
+                result = f"[{tool} returned {tokens} tokens, omitted: over the tool output budget of this turn]"
+            else:
+                # Cut proportionally by characters, which holds for the token estimate and is close enough for tiktoken
+                result = result[:len(result) * room // tokens] + marker
+            tokens = self.count(result)
+        self.remaining = max(self.remaining - tokens, 0)
+        stats["sent_tokens"] += tokens
+        return result
+
+    def report(self):
+        return {tool: dict(stats) for tool, stats in self.stats.items()}
@@ -0,0 +1,42 @@
+import json
+
+from maze.models import Activity, ItemTemplate
+from maze.models.maze import Maze
+
+
+###########################
+# Generated Content Packs #
+###########################
+
+def load_content_pack(path):
+    """Read a content pack written by agents.lore_writer."""
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def apply_content_pack(maze: Maze, pack):
+    """
+    Swap the populated templates of a maze for their lore-driven versions.
+
+    Only the text changes: durability, effects and activity logic stay those
+    of the original templates, and the placement layers are untouched, so this
+    is a per-template (not per-cell) operation and makes no LLM calls. Fields
+    missing from the pack keep the template's own text. The generated NPCs
+    are left on `maze.npc_content` for whoever creates the NPC agents.
+    """
+    items = pack.get("items", {})
+    maze.item_templates = tuple(
+        ItemTemplate(template.name, items[template.name].get("description", template.description),
+                     items[template.name].get("inspection_detail", template.inspection_detail),
+                     durability=template.durability, effect=template.effect)
+        if isinstance(items.get(template.name), dict) else template
+        for template in maze.item_templates
+    )
+    activities = pack.get("activities", {})
+    maze.activity_templates = tuple(
+        Activity(activities[template.description].get("description", template.description), template.execute)
+        if isinstance(activities.get(template.description), dict) else template
+        for template in maze.activity_templates
+    )
+    maze.npc_content = [npc for npc in pack.get("npcs", []) if isinstance(npc, dict)]
+    return maze
@@ -1,7 +1,10 @@
 
+import json
 from typing import Literal, Union, Callable, get_type_hints, Tuple
 
+from maze.events import describe_event
 from maze.models.cell import Cell
+from maze.models.fog import FogOfWar
 from maze.models.maze import Maze  # Adjust if Maze class location is changed
 import logging 
 
@@ -37,40 +40,59 @@ class MazeController:
     Attributes:
         maze (Maze): The maze object representing the environment.
         current_location (Tuple[int, int]): The current location of the player in the maze.
+        fog (FogOfWar): The cells the player has explored and can currently see.
+        world (SharedMaze): The shared maze this player explores together with others, or None when playing alone.
+        event_log (GameEventLog): Append-only log of the player's state changes, or None when not recorded.
+        compact (bool): Answer moves and looks with the terse structured view (see describe_compact) instead of prose.
 
     Methods:
         intro_maze(): Introduces the maze to the player and shows available moves.
         get_current_position(): Returns a description of the current location.
         get_location_description(): Provides a description of the current location, including possible paths, items, and NPCs.
+        describe_compact(): Terse structured view of the current location with only what changed since the last look.
+        look(detail): The compact view, or the full description when compact mode is off or `detail` is asked for.
         get_npcs_at_location(): Retrieves NPCs present at the current location.
+        locate_npc(name): Returns the position of an NPC by name.
         move_player(direction: str) -> str: Moves the player in the specified direction if possible.
         can_move(current_cell, next_cell, direction): Checks if the player can move from the current cell to the next cell in the specified direction.
-        display_maze(): Displays the current state of the maze.
+        display_maze(detail): Displays the explored part of the maze, only around the player in compact mode.
         inspect_item(): Returns detailed information about the item in the current location.
         use_item(): Uses the item in the current location.
         interact_with_activity(): Interacts with the activity in the current location.
     """
-    def __init__(self, width: int, height: int, npcs: list = []):
-        # Directly use the Maze class for creating the maze
-        self.maze = Maze(width, height, npcs=npcs)
-        self.current_location = self.maze.start_point  # instead of self.get_random_start()
+    NEARBY_RADIUS = 3  # walkable steps within which nearby characters are mentioned
+    MAP_RADIUS = 3  # cells around the player drawn by the compact map
+    SUMMARY_LENGTH = 80  # characters of an entity's description shown the first time it is seen in compact mode
+
+    def __init__(self, width: int, height: int, npcs: list = [], maze: Maze = None, world=None, player_id=None,
+                 start: Tuple[int, int] = None):
+        # Directly use the Maze class for creating the maze, unless the player joins an existing (shared) maze
+        self.maze = maze or Maze(width, height, npcs=npcs)
+        if maze is not None and npcs:
+            # A ready-made maze (e.g. from maze.pool.MazePool) still needs this session's characters
+            self.maze.place_npcs(npcs)
+        self.world = world  # SharedMaze this player belongs to, if any
+        self.player_id = player_id
+        self.current_location = start or self.maze.start_point  # instead of self.get_random_start()
+        self.fog = FogOfWar(self.maze)
+        self.fog.reveal(self.current_location)
+        self.claimed_activities = set()  # cells whose activity the player has taken part in
+        self.event_log = None  # GameEventLog every state change is recorded to, see attach_event_log
+        self.compact = False
+        self._described = set()  # entity IDs whose description the compact view already sent
+        self._last_sight = {}  # characters in sight at the last compact look, to only send changes
         # check if the list has npcs
         print(f"NPCs: {npcs}")
-        if npcs:
-            # Initialize the first npc in the starting location    
-            self.maze.maze_grid[self.current_location[0]][self.current_location[1]].npcs.append(npcs[0])
-            # Initialize the rest of the npcs in random locations
-            for npc in npcs[1:]:
-                x, y = self.get_random_location()
-                self.maze.maze_grid[x][y].npcs.append(npc)
-                npc.send_initial_greeting()
+        # The maze already placed the first npc at the starting location and the rest at random locations
+        for npc in npcs[1:]:
+            npc.send_initial_greeting()
 
     def intro_maze(self):
         """Introduce the maze to the player and show available moves."""
         return "Welcome to the maze! Try to find your way out.\n" + self.get_location_description()
 
-    def get_current_position(self):
-        return self.get_location_description()
+    def get_current_position(self, detail=False):
+        return self.look(detail)
 
 
     def get_location_description(self):
@@ -102,18 +124,35 @@ class MazeController:
         paths = "Paths available: " + ", ".join(directions) if directions else "You are trapped with no paths available."
 
         # Check for an item in the current cell and create a description if present
-        if cell.item:
-            descriptions.append(f"You see an item here: {cell.item.name} - {cell.item.description}")
+        item = self.maze.get_item(x, y)
+        if item:
+            descriptions.append(f"You see an item here: {item.name} - {item.description}")
         else:
             descriptions.append("There is nothing of interest here.")
 
         # Check if there is an NPC in this cell
-        if cell.npcs:
-            for npc in cell.npcs:
-                descriptions.append(f"You encounter a character: {npc.name}. {npc.system_message}")
+        for npc in self.get_npcs_at_location():
+            descriptions.append(f"You encounter a character: {npc.name}. {npc.system_message}")
+
+        # Other explorers in a shared maze: who is here and what happened around the player
+        if self.world is not None:
+            others = self.world.players_at(self.current_location, exclude=self.player_id)
+            if others:
+                descriptions.append("Other explorers here: " + ", ".join(str(other) for other in others))
+            for event in self.world.drain(self.player_id):
+                descriptions.append("Meanwhile: " + describe_event(event))
+
+        # Characters a few steps away that the player can actually see down the open corridors
+        nearby = [
+            f"{npc.name} ({distance} steps away)"
+            for npc, position, distance in self.maze.entities_within(self.current_location, self.NEARBY_RADIUS, kind="npc")
+            if distance > 0 and self.fog.is_visible(*position)
+        ]
+        if nearby:
+            descriptions.append("Characters in sight: " + ", ".join(nearby))
 
         # Describing activities
-        for activity in cell.activities:
+        for activity in self.maze.get_activities(x, y):
             descriptions.append(f"Activity available: {activity.description}")
 
 
@@ -123,11 +162,85 @@ class MazeController:
         
         return location_description
 
+    def exits(self):
+        """Open directions out of the current cell, as a string of N, S, E and W."""
+        x, y = self.current_location
+        walls = self.maze.maze_grid[x][y].walls
+        inside = {"N": y > 0, "S": y < self.maze.height - 1, "E": x < self.maze.width - 1, "W": x > 0}
+        return "".join(direction for direction in "NSEW" if not walls[direction] and inside[direction])
+
+    def _summarize(self, entity_id, description, view):
+        # An entity is described once, the first time it shows up; after that the view only names it
+        if entity_id not in self._described:
+            self._described.add(entity_id)
+            view.setdefault("new", {})[entity_id] = description[:self.SUMMARY_LENGTH]
+        return entity_id
+
+    def describe_compact(self):
+        """
+        Terse structured (JSON) view of the current location: position, exits and the IDs of what is here.
+        Descriptions are only sent the first time an entity is seen and characters in sight only when they
+        changed since the last look; `get_location_description` has the full detail.
+        """
+        x, y = self.current_location
+        view = {"at": [x, y], "exits": self.exits()}
+        item = self.maze.get_item(x, y)
+        if item:
+            view["item"] = self._summarize(item.name, item.description, view)
+        npcs = [self._summarize(npc.name, npc.system_message, view) for npc in self.get_npcs_at_location()]
+        if npcs:
+            view["npcs"] = npcs
+        activities = [activity.description for activity in self.maze.get_activities(x, y)]
+        if activities:
+            view["acts"] = activities
+        if self.world is not None:
+            others = self.world.players_at(self.current_location, exclude=self.player_id)
+            if others:
+                view["explorers"] = [str(other) for other in others]
+            events = [describe_event(event) for event in self.world.drain(self.player_id)]
+            if events:
+                view["events"] = events
+        sight = {
+            npc.name: distance
+            for npc, position, distance in self.maze.entities_within(self.current_location, self.NEARBY_RADIUS, kind="npc")
+            if distance > 0 and self.fog.is_visible(*position)
+        }
+        if sight != self._last_sight:
+            view["sight"] = sight
+            self._last_sight = sight
+        return json.dumps(view, separators=(",", ":"))
+
+    def look(self, detail=False):
+        """Describe the current location, compactly unless compact mode is off or `detail` is asked for."""
+        if self.compact and not detail:
+            return self.describe_compact()
+        return self.get_location_description()
+
     def get_npcs_at_location(self):
         """Retrieve NPCs present at the current location."""
-        x, y = self.current_location
-        cell = self.maze.maze_grid[x][y]
-        return cell.npcs
+        return self.maze.entities.at(self.current_location, "npc")
+
+    def get_npc(self, name):
+        """Return the NPC with the given name, or None if it is not in the maze."""
+        for npc in self.maze.entities.of_kind("npc"):
+            if npc.name == name:
+                return npc
+        return None
+
+    def attach_event_log(self, event_log):
+        """Record every state change of this player, including NPC dialogue progress, to `event_log`."""
+        self.event_log = event_log
+        for npc in self.maze.entities.of_kind("npc"):
+            npc.event_log = event_log
+
+    def record(self, kind, *args):
+        if self.event_log is not None:
+            self.event_log.append(kind, *args)
+
+    def locate_npc(self, name):
+        """Return the position of the NPC with the given name, or None if it is not in the maze."""
+        npc = self.get_npc(name)
+        return self.maze.locate(npc) if npc is not None else None
 
 
     @annotate_self
@@ -153,7 +266,11 @@ class MazeController:
                 next_cell = self.maze.maze_grid[nx][ny]
                 if self.can_move(current_cell, next_cell, direction[0]):
                     self.current_location = (nx, ny)
-                    return self.get_location_description()
+                    self.fog.reveal(self.current_location)
+                    self.record("m", nx, ny)
+                    if self.world is not None:
+                        self.world.player_moved(self.player_id, (x, y), self.current_location)
+                    return self.look()
                 else:
                     return "You can't move that way."
             else:
@@ -174,33 +291,43 @@ class MazeController:
         else:
             return False  # Invalid direction
     @annotate_self
-    def display_maze(self):
-        """Utilize the Maze display function or define here if needed."""
-        return self.maze.display_maze(self.current_location)
+    def display_maze(self, detail: bool = False):
+        """Display the part of the maze the player has explored, only the cells around the player in compact mode."""
+        radius = self.MAP_RADIUS if self.compact and not detail else None
+        return self.maze.display_maze(self.current_location, fog=self.fog, radius=radius)
     
     @annotate_self
     def inspect_item(self):
         x, y = self.current_location
-        cell: Cell = self.maze.maze_grid[x][y]
-        if cell.item:
-            return cell.item.inspect_item()
+        item = self.maze.get_item(x, y)
+        if item:
+            return item.inspect_item()
         else:
             return "There is no item here to inspect."
         
     @annotate_self
     def use_item(self):
         x, y = self.current_location
-        cell: Cell = self.maze.maze_grid[x][y]
-        if cell.item:
-            return cell.item.use_item()
+        item = self.maze.get_item(x, y)
+        if item:
+            result = self.maze.use_item(x, y)
+            self.record("u", x, y, self.maze.get_item_durability(x, y))
+            if self.world is not None:
+                self.world.publish("item", self.player_id, self.current_location, item=item.name)
+            return result
         else:
             return "There is no item here to use."
         
     @annotate_self
     def interact_with_activity(self):
         x, y = self.current_location
-        cell: Cell = self.maze.maze_grid[x][y]
-        if cell.activities:
-            return cell.activities[0].interact()
+        activities = self.maze.get_activities(x, y)
+        if activities:
+            result = activities[0].interact()
+            self.claimed_activities.add((x, y))
+            self.record("a", x, y)
+            if self.world is not None:
+                self.world.publish("activity", self.player_id, self.current_location, activity=activities[0].description)
+            return result
         else:
             return "There is no activity here to interact with."
@@ -0,0 +1,247 @@
+import glob
+import json
+import logging
+import os
+import pickle
+import time
+
+from maze.controller import MazeController
+
+
+###########################################
+# Event-sourced Game State with Snapshots #
+###########################################
+
+# Compact event kinds: ["m", x, y] move, ["u", x, y, durability] item use,
+# ["d", npc_name, dialogue_index] dialogue advance, ["a", x, y] activity claim.
+
+class NPCPickler(pickle.Pickler):
+    """Pickles NPC agents as references by name, so a snapshot holds game state but not LLM clients."""
+    def __init__(self, file, npcs):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.npcs = {id(npc): npc.name for npc in npcs}
+
+    def persistent_id(self, obj):
+        name = self.npcs.get(id(obj))
+        return ("npc", name) if name is not None else None
+
+
+class NPCUnpickler(pickle.Unpickler):
+    """Resolves the NPC references written by NPCPickler to the live agents of the restored session."""
+    def __init__(self, file, npcs):
+        super().__init__(file)
+        self.npcs = {npc.name: npc for npc in npcs}
+
+    def persistent_load(self, pid):
+        _, name = pid
+        if name not in self.npcs:
+            raise pickle.UnpicklingError(f"No NPC named '{name}' was given to restore the snapshot with.")
+        return self.npcs[name]
+
+
+def dump_controller(controller: MazeController, file):
+    """Write the full game state of a controller (maze, position, fog, claims, dialogue progress)."""
+    npcs = controller.maze.entities.of_kind("npc")
+    NPCPickler(file, npcs).dump({
+        "maze": controller.maze,
+        "player_id": controller.player_id,
+        "current_location": controller.current_location,
+        "fog": (controller.fog.explored, controller.fog.visible, controller.fog.bounds),
+        "claimed_activities": controller.claimed_activities,
+        "dialogue": {npc.name: npc.dialogue_index for npc in npcs},
+    })
+
+
+def load_controller(file, npcs=()):
+    """Rebuild a controller written by dump_controller, reattaching the given NPC agents by name."""
+    state = NPCUnpickler(file, npcs).load()
+    maze = state["maze"]
+    controller = MazeController(maze.width, maze.height, maze=maze, player_id=state["player_id"],
+                                start=state["current_location"])
+    controller.fog.restore(*state["fog"])
+    controller.claimed_activities = state["claimed_activities"]
+    for name, dialogue_index in state["dialogue"].items():
+        controller.get_npc(name).dialogue_index = dialogue_index
+    return controller
+
+
+def apply_event(controller: MazeController, event):
+    """Apply one recorded event to a controller, without side effects such as sending messages or claiming POAPs."""
+    kind = event[0]
+    if kind == "m":
+        controller.current_location = (event[1], event[2])
+        controller.fog.reveal(controller.current_location)
+    elif kind == "u":
+        controller.maze.set_item_durability(event[1], event[2], event[3])
+    elif kind == "d":
+        controller.get_npc(event[1]).dialogue_index = event[2]
+    elif kind == "a":
+        controller.claimed_activities.add((event[1], event[2]))
+    else:
+        raise ValueError(f"Unknown event kind '{kind}'.")
+
+
+def _parse_event(line):
+    """An event from one log line, or None for a line torn by a crash mid-write (cut short or unterminated)."""
+    if not line.endswith(b"\n"):
+        return None
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+
+def _complete_events(path):
+    """Yield (end offset, event) for the events of a log segment, stopping at a torn line."""
+    end = 0
+    with open(path, "rb") as f:
+        for line in f:
+            event = _parse_event(line)
+            if event is None:
+                logging.error(f"Ignoring torn event at the end of {path}")
+                return
+            end += len(line)
+            yield end, event
+
+
+def read_events(path):
+    """Yield the events of a log segment, stopping at a line torn by a crash mid-write."""
+    for _, event in _complete_events(path):
+        yield event
+
+
+def open_segment(path):
+    """Open a log segment for appending, first cutting off a torn last line so new events don't join it."""
+    if os.path.exists(path):
+        end = 0
+        for end, _ in _complete_events(path):
+            pass
+        if end < os.path.getsize(path):
+            os.truncate(path, end)
+    return open(path, "a")
+
+
+class GameEventLog:
+    """
+    Append-only log of a session's state changes, with periodic snapshots.
+
+    Every change is written as one compact JSON array per line. Every
+    `snapshot_every` events the full state is snapshotted and a new log
+    segment is started, so restoring a session loads the latest snapshot and
+    replays at most `snapshot_every` events however long it has been running.
+    A lower `snapshot_every` bounds restore time more tightly at the cost of
+    more snapshot writes; `flush=False` trades durability of the last events
+    for log write throughput.
+
+    The directory holds `snapshot-<seq>.pkl` files and `events-<seq>.log`
+    segments, where `<seq>` is the number of events before the snapshot and
+    the segment holds the events that follow it.
+
+    Attributes:
+        directory (str): Where snapshots and log segments are written.
+        controller (MazeController): The session being recorded.
+        snapshot_every (int): Events between snapshots.
+        seq (int): Number of events recorded since the session started.
+        snapshot_seq (int): `seq` at the latest snapshot.
+    """
+    def __init__(self, directory, controller: MazeController, snapshot_every=500, flush=True, seq=0, snapshot_seq=0):
+        self.directory = directory
+        self.controller = controller
+        self.snapshot_every = snapshot_every
+        self.flush = flush
+        self.seq = seq
+        self.snapshot_seq = snapshot_seq
+        self._segment = None
+        os.makedirs(directory, exist_ok=True)
+        controller.attach_event_log(self)
+
+    @classmethod
+    def start(cls, directory, controller: MazeController, **kwargs):
+        """Start recording a new session with an initial snapshot."""
+        event_log = cls(directory, controller, **kwargs)
+        event_log.snapshot()
+        return event_log
+
+    def _path(self, kind, seq):
+        return os.path.join(self.directory, f"{kind}-{seq:010d}.{'pkl' if kind == 'snapshot' else 'log'}")
+
+    def append(self, kind, *args):
+        self._segment.write(json.dumps([kind, *args], separators=(",", ":")) + "\n")
+        if self.flush:
+            self._segment.flush()
+        self.seq += 1
+        if self.seq - self.snapshot_seq >= self.snapshot_every:
+            self.snapshot()
+
+    def snapshot(self):
+        """Write the full state and start a new log segment after it."""
+        started = time.perf_counter()
+        path = self._path("snapshot", self.seq)
+        with open(path + ".tmp", "wb") as f:
+            dump_controller(self.controller, f)
+        os.replace(path + ".tmp", path)
+        self.close()
+        self.snapshot_seq = self.seq
+        self._segment = open_segment(self._path("events", self.seq))
+        logging.info(f"Snapshot at event {self.seq} written in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    def close(self):
+        if self._segment is not None:
+            self._segment.close()
+            self._segment = None
+
+    @staticmethod
+    def snapshot_seqs(directory):
+        return sorted(int(os.path.basename(path)[len("snapshot-"):-len(".pkl")])
+                      for path in glob.glob(os.path.join(directory, "snapshot-*.pkl")))
+
+    @classmethod
+    def restore(cls, directory, npcs=(), **kwargs):
+        """
+        Rebuild a session from its latest snapshot plus the events logged after it, and keep
+        recording to the same directory. Returns the restored MazeController.
+        """
+        snapshot_seq = cls.snapshot_seqs(directory)[-1]
+        with open(os.path.join(directory, f"snapshot-{snapshot_seq:010d}.pkl"), "rb") as f:
+            controller = load_controller(f, npcs)
+        seq = snapshot_seq
+        segment = os.path.join(directory, f"events-{snapshot_seq:010d}.log")
+        if os.path.exists(segment):
+            for event in read_events(segment):
+                apply_event(controller, event)
+                seq += 1
+        # Continue in a fresh segment after replayed events; without any, the torn tail (if any) is cut off
+        event_log = cls(directory, controller, seq=seq, snapshot_seq=snapshot_seq, **kwargs)
+        if seq > snapshot_seq:
+            event_log.snapshot()
+        else:
+            event_log._segment = open_segment(segment)
+        return controller
+
+    @classmethod
+    def resume(cls, directory, controller: MazeController, **kwargs):
+        """
+        Keep recording a session that was restored some other way (e.g. SaturnChatApp.rehydrate) to its
+        existing log: numbering continues after the last logged event, from a snapshot of `controller`.
+        """
+        snapshot_seq = cls.snapshot_seqs(directory)[-1]
+        seq = snapshot_seq
+        segment = os.path.join(directory, f"events-{snapshot_seq:010d}.log")
+        if os.path.exists(segment):
+            seq += sum(1 for _ in read_events(segment))
+        event_log = cls(directory, controller, seq=seq, snapshot_seq=snapshot_seq, **kwargs)
+        event_log.snapshot()
+        return event_log
+
+    @classmethod
+    def replay(cls, directory, npcs=()):
+        """Replay a whole session from its first snapshot, yielding the controller after every event."""
+        seqs = cls.snapshot_seqs(directory)
+        with open(os.path.join(directory, f"snapshot-{seqs[0]:010d}.pkl"), "rb") as f:
+            controller = load_controller(f, npcs)
+        for seq in seqs:
+            segment = os.path.join(directory, f"events-{seq:010d}.log")
+            if os.path.exists(segment):
+                for event in read_events(segment):
+                    apply_event(controller, event)
+                    yield controller
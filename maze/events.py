@@ -0,0 +1,81 @@
+from collections import defaultdict
+
+
+class EventBroker:
+    """
+    Local in-process publish/subscribe broker.
+
+    Subscribers register a callback per topic (for the shared maze a topic is
+    a cell position), so publishing an event only touches the subscribers of
+    that one topic: routing is a dictionary lookup plus one call per
+    interested subscriber, whatever the total number of subscribers.
+
+    Attributes:
+        topics (dict): Maps each topic to a {subscriber_id: callback} dictionary.
+        subscriptions (dict): Maps each subscriber to the set of topics it listens to.
+    """
+    def __init__(self):
+        self.topics = defaultdict(dict)
+        self.subscriptions = defaultdict(set)
+        self.published = 0
+        self.delivered = 0
+
+    def subscribe(self, subscriber_id, topic, callback):
+        self.topics[topic][subscriber_id] = callback
+        self.subscriptions[subscriber_id].add(topic)
+
+    def _remove_subscriber(self, subscriber_id, topic):
+        subscribers = self.topics.get(topic)
+        if subscribers is not None:
+            subscribers.pop(subscriber_id, None)
+            if not subscribers:
+                del self.topics[topic]
+
+    def unsubscribe(self, subscriber_id, topic):
+        self._remove_subscriber(subscriber_id, topic)
+        # Subscribers without topics are dropped, so subscriptions doesn't grow with every player who ever joined
+        topics = self.subscriptions.get(subscriber_id)
+        if topics is not None:
+            topics.discard(topic)
+            if not topics:
+                del self.subscriptions[subscriber_id]
+
+    def unsubscribe_all(self, subscriber_id):
+        for topic in self.subscriptions.pop(subscriber_id, ()):
+            self._remove_subscriber(subscriber_id, topic)
+
+    def resubscribe(self, subscriber_id, topics, callback):
+        """Replace a subscriber's topics with `topics`, only touching the ones that changed."""
+        current = set(self.subscriptions.get(subscriber_id, ()))
+        for topic in current - topics:
+            self.unsubscribe(subscriber_id, topic)
+        for topic in topics - current:
+            self.subscribe(subscriber_id, topic, callback)
+
+    def publish(self, topic, event, exclude=None):
+        """Deliver an event to every subscriber of a topic except `exclude`. Returns the number of deliveries."""
+        self.published += 1
+        subscribers = self.topics.get(topic)
+        if not subscribers:
+            return 0
+        delivered = 0
+        for subscriber_id, callback in list(subscribers.items()):
+            if subscriber_id != exclude:
+                callback(event)
+                delivered += 1
+        self.delivered += delivered
+        return delivered
+
+
+def describe_event(event):
+    """Turn a shared maze event into a sentence for the player who received it."""
+    player = event["player"]
+    if event["type"] == "arrive":
+        return f"{player} arrived at {event['position']}."
+    if event["type"] == "leave":
+        return f"{player} left {event['position']}."
+    if event["type"] == "item":
+        return f"{player} used the {event['item']} at {event['position']}."
+    if event["type"] == "activity":
+        return f"{player} took part in '{event['activity']}' at {event['position']}."
+    return f"{player}: {event['type']} at {event['position']}."
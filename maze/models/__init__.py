@@ -1,3 +1,5 @@
 from .activity import Activity, POAPActivity
 from .cell import Cell
-from .item import Item
\ No newline at end of file
+from .item import Item, ItemTemplate
+from .entity_index import EntityIndex
+from .fog import FogOfWar
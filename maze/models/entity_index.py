@@ -0,0 +1,128 @@
+from collections import defaultdict
+
+import numpy as np
+
+
+class EntityIndex:
+    """
+    Spatial index of the entities (NPCs, items, activities) placed in a maze.
+
+    Keeps a position -> entities map and an entity -> position reverse map in
+    step, so both "what is here" and "where is this" are dictionary lookups.
+
+    Content placed by the population stage is not indexed entity by entity:
+    it stays in the maze's template index layers, which `layers(kind)`
+    returns as a (layer, templates) pair. `at`, `of_kind` and
+    `positions_within` read those layers as well, so lookups cover populated
+    content; `position_of`, `count` and the listeners only cover the indexed
+    entities, as layer placements never move.
+
+    Attributes:
+        by_position (dict): Maps (x, y) to a {kind: [entities]} dictionary.
+        positions (dict): Maps each entity to its (x, y) position.
+        kinds (dict): Maps each entity to its kind ("npc", "item" or "activity").
+    """
+    LAYER_KINDS = ("item", "activity")
+    layers = None  # indexes pickled before layers existed have none
+
+    def __init__(self, layers=None):
+        self.by_position = {}
+        self.positions = {}
+        self.kinds = {}
+        self.counts = defaultdict(int)
+        self.listeners = []  # called as listener(change, entity, position, kind) on every add/remove
+        self.layers = layers  # called as layers(kind) -> (layer, templates), e.g. Maze.layer
+
+    def __getstate__(self):
+        # Listeners belong to live sessions (e.g. state sync feeds), not to the maze state
+        state = self.__dict__.copy()
+        state["listeners"] = []
+        return state
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __contains__(self, entity):
+        return entity in self.positions
+
+    def add(self, entity, position, kind):
+        """Add an entity at a position. Re-adding an indexed entity moves it."""
+        if entity in self.positions:
+            self.remove(entity)
+        self.by_position.setdefault(position, {}).setdefault(kind, []).append(entity)
+        self.positions[entity] = position
+        self.kinds[entity] = kind
+        self.counts[kind] += 1
+        for listener in self.listeners:
+            listener("+", entity, position, kind)
+
+    def remove(self, entity):
+        """Remove an entity from the index and return its last position."""
+        position = self.positions.pop(entity)
+        kind = self.kinds.pop(entity)
+        bucket = self.by_position[position]
+        bucket[kind].remove(entity)
+        if not bucket[kind]:
+            del bucket[kind]
+        if not bucket:
+            del self.by_position[position]
+        self.counts[kind] -= 1
+        for listener in self.listeners:
+            listener("-", entity, position, kind)
+        return position
+
+    def move(self, entity, position):
+        """Move an indexed entity to a new position and return its old position."""
+        kind = self.kinds[entity]
+        old_position = self.remove(entity)
+        self.add(entity, position, kind)
+        return old_position
+
+    def position_of(self, entity):
+        return self.positions.get(entity)
+
+    def _layers(self, kind=None):
+        """The populated (kind, layer, templates) to look in, for one kind or all of them."""
+        if self.layers is None:
+            return []
+        kinds = self.LAYER_KINDS if kind is None else [kind] if kind in self.LAYER_KINDS else []
+        layers = [(layer_kind, *self.layers(layer_kind)) for layer_kind in kinds]
+        return [(layer_kind, layer, templates) for layer_kind, layer, templates in layers if layer is not None]
+
+    def at(self, position, kind=None):
+        """Return the entities at a position, optionally only those of one kind, populated templates included."""
+        bucket = self.by_position.get(position, {})
+        if kind is not None:
+            entities = list(bucket.get(kind, []))
+        else:
+            entities = [entity for entities in bucket.values() for entity in entities]
+        for layer_kind, layer, templates in self._layers(kind):
+            index = layer[position]
+            # An item placed explicitly replaces the populated one, as in Maze.get_item
+            if index >= 0 and not (layer_kind == "item" and "item" in bucket):
+                entities.append(templates[index])
+        return entities
+
+    def of_kind(self, kind):
+        """Return the entities of a kind: the indexed ones, then each populated template placed at least once."""
+        entities = [entity for entity, entity_kind in self.kinds.items() if entity_kind == kind]
+        for _, layer, templates in self._layers(kind):
+            entities += [templates[index] for index in np.unique(layer[layer >= 0])]
+        return entities
+
+    def positions_within(self, position, radius, kind=None):
+        """Return the cells at most `radius` cells away (Manhattan distance) holding entities, optionally of one kind."""
+        px, py = position
+        found = {
+            (x, y) for (x, y), bucket in self.by_position.items()
+            if abs(x - px) + abs(y - py) <= radius and (kind is None or kind in bucket)
+        }
+        x0, y0 = max(px - radius, 0), max(py - radius, 0)
+        for _, layer, _ in self._layers(kind):
+            for x, y in np.argwhere(layer[x0:px + radius + 1, y0:py + radius + 1] >= 0).tolist():
+                if abs(x + x0 - px) + abs(y + y0 - py) <= radius:
+                    found.add((x + x0, y + y0))
+        return found
+
+    def count(self, kind=None):
+        return len(self.positions) if kind is None else self.counts[kind]
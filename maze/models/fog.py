@@ -0,0 +1,136 @@
+import numpy as np
+
+
+class FogOfWar:
+    """
+    What one player knows about a maze.
+
+    The explored cells are kept as a list in reveal order and as a byte mask,
+    and the visible cells as a set, so revealing, listing, rendering and
+    testing cells scale with the explored area. Bitsets (Python ints, bit
+    `y * width + x` per cell), for compact snapshots and diffing, cost time
+    proportional to the whole maze, so they are only built when asked for.
+    The bounding box of the explored area is tracked so rendering never has
+    to look at the rest of the maze.
+
+    Attributes:
+        maze (Maze): The maze being explored.
+        explored (int): Bitset of every cell the player has seen, built on access.
+        visible (int): Bitset of the cells in line of sight from the player's current cell, built on access.
+        bounds (tuple): (min_x, min_y, max_x, max_y) of the explored cells, or None before the first reveal.
+        explored_order (list): Explored (x, y) cells in the order they were revealed.
+    """
+    SIGHT_LINES = (("N", 0, -1), ("S", 0, 1), ("E", 1, 0), ("W", -1, 0))
+
+    def __init__(self, maze):
+        self.maze = maze
+        self.bounds = None
+        self.explored_order = []
+        self.explored_mask = bytearray(maze.width * maze.height)
+        self.visible_positions = frozenset()
+
+    def restore(self, explored, visible, bounds):
+        """Set the state from bitsets (as written to snapshots) and rebuild the cell lists from them."""
+        self.bounds = bounds
+        self.explored_order = self.cells(explored)
+        self.explored_mask = bytearray(self.maze.width * self.maze.height)
+        for x, y in self.explored_order:
+            self.explored_mask[y * self.maze.width + x] = 1
+        self.visible_positions = frozenset(self.cells(visible))
+
+    def bit(self, x, y):
+        return 1 << (y * self.maze.width + x)
+
+    def explored_bytes(self):
+        """The explored bitset as little-endian bytes, one bit per cell, packed straight from the byte mask."""
+        return np.packbits(np.frombuffer(self.explored_mask, dtype=np.uint8), bitorder="little").tobytes()
+
+    @property
+    def explored(self):
+        return int.from_bytes(self.explored_bytes(), "little")
+
+    @property
+    def visible(self):
+        return sum(self.bit(x, y) for x, y in self.visible_positions)
+
+    def is_explored(self, x, y):
+        return bool(self.explored_mask[y * self.maze.width + x])
+
+    def is_visible(self, x, y):
+        return (x, y) in self.visible_positions
+
+    def reveal(self, position):
+        """
+        Update the visible set from `position`, looking straight down every open corridor until
+        a wall blocks the view, and add it to the explored set. Returns the list of newly explored cells.
+        """
+        x, y = position
+        width = self.maze.width
+        grid = self.maze.maze_grid
+        seen = [(x, y)]
+        min_x, min_y, max_x, max_y = self.bounds or (x, y, x, y)
+        for side, dx, dy in self.SIGHT_LINES:
+            cx, cy = x, y
+            while not grid[cx][cy].walls[side] and 0 <= cx + dx < self.maze.width and 0 <= cy + dy < self.maze.height:
+                cx, cy = cx + dx, cy + dy
+                seen.append((cx, cy))
+            min_x, max_x = min(min_x, cx), max(max_x, cx)
+            min_y, max_y = min(min_y, cy), max(max_y, cy)
+        self.bounds = (min_x, min_y, max_x, max_y)
+        newly_explored = [(cx, cy) for cx, cy in seen if not self.explored_mask[cy * width + cx]]
+        for cx, cy in newly_explored:
+            self.explored_mask[cy * width + cx] = 1
+        self.explored_order.extend(newly_explored)
+        self.visible_positions = frozenset(seen)
+        return newly_explored
+
+    def cells(self, bits):
+        """Return the (x, y) positions of the set bits of a bitset, lowest first, in one pass over its bytes."""
+        if not bits:
+            return []
+        width = self.maze.width
+        data = np.frombuffer(bits.to_bytes((bits.bit_length() + 7) // 8, "little"), dtype=np.uint8)
+        return [(int(index) % width, int(index) // width)
+                for index in np.flatnonzero(np.unpackbits(data, bitorder="little"))]
+
+    def explored_cells(self):
+        return self.explored_order
+
+    def visible_cells(self):
+        return list(self.visible_positions)
+
+    def explored_count(self):
+        return len(self.explored_order)
+
+    def render(self, player_location, radius=None):
+        """
+        Draw the explored part of the maze only; unexplored cells inside the explored area stay blank.
+        With `radius`, only the explored cells within that many cells of the player are drawn.
+        """
+        if self.bounds is None:
+            return ""
+        min_x, min_y, max_x, max_y = self.bounds
+        if radius is not None:
+            px, py = player_location
+            min_x, min_y = max(min_x, px - radius), max(min_y, py - radius)
+            max_x, max_y = min(max_x, px + radius), min(max_y, py + radius)
+        canvas = [[" "] * (3 * (max_x - min_x + 1) + 1) for _ in range(2 * (max_y - min_y + 1) + 1)]
+        grid = self.maze.maze_grid
+        for x, y in self.explored_cells():
+            if not (min_x <= x <= max_x and min_y <= y <= max_y):
+                continue
+            walls = grid[x][y].walls
+            row, col = 2 * (y - min_y), 3 * (x - min_x)
+            for corner_row in (row, row + 2):
+                canvas[corner_row][col] = canvas[corner_row][col + 3] = "+"
+            if walls["N"]:
+                canvas[row][col + 1] = canvas[row][col + 2] = "-"
+            if walls["S"]:
+                canvas[row + 2][col + 1] = canvas[row + 2][col + 2] = "-"
+            if walls["W"]:
+                canvas[row + 1][col] = "|"
+            if walls["E"]:
+                canvas[row + 1][col + 3] = "|"
+            if (x, y) == tuple(player_location):
+                canvas[row + 1][col + 2] = "O"
+        return "\n".join("".join(line).rstrip() for line in canvas)
@@ -41,3 +41,55 @@ class Item:
     def __str__(self):
         durability_str = f", Durability: {'Infinite' if self.durability is None else self.durability}"
         return f"{self.name}: {self.description}{durability_str}"
+
+
+class ItemTemplate:
+    """
+    Shared, immutable description of a kind of item.
+
+    One template is shared by every cell holding that kind of item, so a
+    placement costs an index into a template table instead of a full object.
+    Remaining durability is per placement and is kept sparsely by the maze,
+    only for items that have been used. `effect` is the text appended when the
+    item is used, in place of a per-instance callback.
+    """
+    __slots__ = ("name", "description", "inspection_detail", "durability", "effect")
+
+    def __init__(self, name, description, inspection_detail=None, durability=None, effect=None):
+        for attribute, value in zip(self.__slots__, (name, description, inspection_detail, durability, effect)):
+            object.__setattr__(self, attribute, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"ItemTemplate '{self.name}' is immutable.")
+
+    def __reduce__(self):
+        return (ItemTemplate, (self.name, self.description, self.inspection_detail, self.durability, self.effect))
+
+    def inspect_item(self):
+        """Return detailed information about this kind of item."""
+        if self.inspection_detail:
+            return f"{self.name} - {self.description}. Further Details: {self.inspection_detail}"
+        return f"{self.name} - {self.description}. No additional details available."
+
+    def use_item(self, durability):
+        """Use one placement of this item with `durability` uses left. Returns the message and the durability left."""
+        if durability is not None:
+            if durability == 0:
+                return f"The {self.name} is already worn out and cannot be used.", durability
+            durability -= 1
+            use_message = f"You use the {self.name}."
+            if durability > 0:
+                use_message += f" It can be used {durability} more times."
+            else:
+                use_message += " It has worn out and can no longer be used."
+        else:
+            use_message = f"You use the {self.name}, but it seems to last forever."
+
+        if self.effect:
+            use_message += " " + self.effect
+
+        return use_message, durability
+
+    def __str__(self):
+        durability_str = f", Durability: {'Infinite' if self.durability is None else self.durability}"
+        return f"{self.name}: {self.description}{durability_str}"
@@ -1,7 +1,8 @@
 import random
 import logging
+from collections import deque
 
-from . import POAPActivity, Cell, Item
+from . import POAPActivity, Cell, ItemTemplate, EntityIndex
 # Set up basic configuration for logging
 logging.basicConfig(
     level=logging.CRITICAL, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -12,14 +13,40 @@ logging.basicConfig(
 # Custom Maze Implementation #
 ##############################
 
+STARTING_MAP = ItemTemplate("Map", "An old map showing hints of hidden doors.",
+                            "The path to the exit is marked with a red line. When you inspect the map, it read 'The key to the exit is in the room with the sword.",
+                            durability=5,
+                            effect="A hidden door opens somewhere in the maze.")
+
 
 class Maze:
+    """
+    A maze grid and everything placed in it.
+
+    Content lives in two places. NPCs and anything placed with `place_npc`,
+    `place_item` or `place_activity` sits in its cell and is indexed one by
+    one in `entities`, so it can be moved and removed. Content from the
+    population stage (maze.population) is stored once per maze as template
+    index layers (`item_layer`, `activity_layer`) and is never indexed per
+    entity. `get_item`, `get_activities`, `entities.at`, `entities.of_kind`
+    and `entities_within` read both; `remove_entity` and `move_entity` only
+    handle indexed entities.
+    """
     def __init__(self, width, height, items_prob=0.7, npcs=None):
         self.width = width
         self.height = height
         self.maze_grid = [[Cell(x, y) for y in range(height)] for x in range(width)]
         self.start_point = random.choice(self.get_all_locations())
         self.finish_point = (width - 2, height - 2)
+        self.entities = EntityIndex(self.layer)  # position <-> entity lookups for NPCs, items and activities
+        # Layers filled by maze.population.populate_maze: template indices per cell, -1 for none
+        self.item_layer = None
+        self.item_templates = ()
+        self.activity_layer = None
+        self.activity_templates = ()
+        self.npc_spawn_points = None
+        self.npc_content = []  # generated NPCs from a content pack, see maze.content
+        self.item_durability = {}  # (x, y) -> uses left, only for template items that have been used
         self.generate_maze()
         self.place_starting_loot()
         self.setup_activities()
@@ -46,10 +73,143 @@ class Maze:
             # npc.send_initial_greeting()
 
     def place_npc(self, npc, x, y):
-        # Assigning NPC to the npc property of the cell
-        self.maze_grid[x][y].npc = npc
+        self.maze_grid[x][y].place_npc(npc)
+        self.entities.add(npc, (x, y), "npc")
         logging.critical(f"NPC {npc.name} placed at {x}, {y}")
 
+    def place_item(self, item, x, y):
+        cell = self.maze_grid[x][y]
+        if cell.item is not None and cell.item in self.entities:
+            self.entities.remove(cell.item)
+        cell.place_item(item)
+        self.entities.add(item, (x, y), "item")
+
+    def place_activity(self, activity, x, y):
+        self.maze_grid[x][y].place_activity(activity)
+        self.entities.add(activity, (x, y), "activity")
+
+    def layer(self, kind):
+        """The (layer, templates) the population stage filled for "item" or "activity", (None, ()) before it ran."""
+        if kind == "item":
+            return self.item_layer, self.item_templates
+        return self.activity_layer, self.activity_templates
+
+    def get_item(self, x, y):
+        """Return the item in a cell: one placed explicitly, or the template the population stage put there."""
+        item = self.maze_grid[x][y].item
+        if item is None and self.item_layer is not None and self.item_layer[x, y] >= 0:
+            item = self.item_templates[self.item_layer[x, y]]
+        return item
+
+    def get_activities(self, x, y):
+        """Return the activities in a cell, including the one the population stage put there."""
+        activities = self.maze_grid[x][y].activities
+        if self.activity_layer is not None and self.activity_layer[x, y] >= 0:
+            activities = activities + [self.activity_templates[self.activity_layer[x, y]]]
+        return activities
+
+    def get_item_durability(self, x, y):
+        """Return the uses left of the item in a cell, None for items that last forever."""
+        item = self.get_item(x, y)
+        if isinstance(item, ItemTemplate):
+            return self.item_durability.get((x, y), item.durability)
+        return item.durability if item is not None else None
+
+    def set_item_durability(self, x, y, durability):
+        """Set the uses left of the item in a cell, e.g. when replaying a recorded use."""
+        item = self.get_item(x, y)
+        if isinstance(item, ItemTemplate):
+            self.item_durability[(x, y)] = durability
+        else:
+            item.durability = durability
+
+    def use_item(self, x, y):
+        """Use the item in a cell. Shared templates keep their remaining durability in `item_durability`."""
+        item = self.get_item(x, y)
+        if not isinstance(item, ItemTemplate):
+            return item.use_item()
+        use_message, durability = item.use_item(self.item_durability.get((x, y), item.durability))
+        if durability is not None:
+            self.item_durability[(x, y)] = durability
+        return use_message
+
+    def remove_entity(self, entity):
+        """Remove an NPC, item or activity from the maze and return its last position."""
+        kind = self.entities.kinds[entity]
+        x, y = self.entities.remove(entity)
+        cell = self.maze_grid[x][y]
+        if kind == "npc":
+            cell.npcs.remove(entity)
+        elif kind == "item":
+            cell.item = None
+        else:
+            cell.activities.remove(entity)
+        return (x, y)
+
+    def move_entity(self, entity, x, y):
+        """Move an NPC, item or activity to another cell, keeping the cells and the index consistent."""
+        kind = self.entities.kinds[entity]
+        self.remove_entity(entity)
+        if kind == "npc":
+            self.place_npc(entity, x, y)
+        elif kind == "item":
+            self.place_item(entity, x, y)
+        else:
+            self.place_activity(entity, x, y)
+
+    def locate(self, entity):
+        """Return the (x, y) position of an entity, or None if it is not in the maze."""
+        return self.entities.position_of(entity)
+
+    def open_neighbours(self, x, y):
+        """Return the positions reachable in one step from (x, y)."""
+        walls = self.maze_grid[x][y].walls
+        neighbours = []
+        if not walls["N"] and y > 0:
+            neighbours.append((x, y - 1))
+        if not walls["S"] and y < self.height - 1:
+            neighbours.append((x, y + 1))
+        if not walls["E"] and x < self.width - 1:
+            neighbours.append((x + 1, y))
+        if not walls["W"] and x > 0:
+            neighbours.append((x - 1, y))
+        return neighbours
+
+    def cells_within(self, position, radius):
+        """Return the set of positions at most `radius` walkable steps away from `position`."""
+        seen = {position}
+        frontier = [position]
+        for _ in range(radius):
+            frontier = [
+                neighbour for current in frontier for neighbour in self.open_neighbours(*current)
+                if neighbour not in seen and not seen.add(neighbour)
+            ]
+        return seen
+
+    def entities_within(self, position, radius, kind=None):
+        """
+        Return (entity, position, distance) tuples for entities at most `radius` walkable steps away,
+        nearest first, populated items and activities included. Cells further than `radius` as the crow
+        flies can never be reached, so the search stops as soon as every candidate cell has been found
+        instead of flooding the whole radius.
+        """
+        candidates = self.entities.positions_within(position, radius, kind)
+        found = []
+        frontier = deque([(position, 0)])
+        seen = {position}
+        while frontier and candidates:
+            current, distance = frontier.popleft()
+            if current in candidates:
+                candidates.discard(current)
+                found.extend((entity, current, distance) for entity in self.entities.at(current, kind))
+            if distance == radius:
+                continue
+            for neighbour in self.open_neighbours(*current):
+                if neighbour not in seen:
+                    seen.add(neighbour)
+                    frontier.append((neighbour, distance + 1))
+        return found
+
 
     def generate_maze(self):
         stack = []
@@ -80,30 +240,12 @@ class Maze:
             # lambda: "You found some rare crystals!" if random.random() > 0.5 else "No crystals here.",
         )
         # Place the activity in the starting location
-        self.maze_grid[self.start_point[0]][self.start_point[1]].place_activity(mining_activity)
-
-
-    # def populate_items(self, prob):
-    #     # Populating items with a certain probability in each cell
-    #     items = [
-    #         Item("Key", "A small rusty key, wonder what it opens."),
-    #         Item("Coin", "A shiny gold coin, valuable."),
-    #         Item("Sword", "An old sword, still sharp. Might come in handy."),
-    #         Item("Potion", "A mysterious potion. Drink at your own risk!")
-    #     ]
-    #     for row in self.maze_grid:
-    #         for cell in row:
-    #             if random.random() < prob:
-    #                 cell.place_item(random.choice(items))
+        self.place_activity(mining_activity, self.start_point[0], self.start_point[1])
+
 
     def place_starting_loot(self):
-        """Place a specific item at the starting point of the maze."""
-        starting_item = Item("Map", "An old map showing hints of hidden doors.",
-                             "The path to the exit is marked with a red line. When you inspect the map, it read 'The key to the exit is in the room with the sword.",
-                             durability=5,
-                             # The custom functionality removes a random wall when used
-                             custom_functionality=lambda: "A hidden door opens somewhere in the maze.")
-        self.maze_grid[self.start_point[0]][self.start_point[1]].item = starting_item
+        """Place the shared starting map at the starting point of the maze."""
+        self.place_item(STARTING_MAP, self.start_point[0], self.start_point[1])
 
 
     def get_unvisited_neighbours(self, cell):
@@ -157,7 +299,13 @@ class Maze:
 
     
 
-    def display_maze(self, player_location):
+    def display_maze(self, player_location, fog=None, radius=None):
+        # With fog of war only the part of the maze the player has explored is drawn (around the player with radius)
+        if fog is not None:
+            maze_representation = fog.render(player_location, radius=radius)
+            print(maze_representation)
+            return maze_representation
+
         # Initialize an empty string to store the maze representation
         maze_representation = ""
 
@@ -204,3 +352,4 @@ class Maze:
 
         # Print the maze representation
         print(maze_representation)
+        return maze_representation
@@ -0,0 +1,125 @@
+import logging
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+
+from maze.models.maze import Maze
+from maze.population import populate_maze
+
+
+##############################
+# Pre-generated Maze Pooling #
+##############################
+
+def build_backtracker(width, height):
+    return Maze(width, height)
+
+
+def build_populated(width, height):
+    return populate_maze(Maze(width, height))
+
+
+# Generators a pool profile can name. They run in worker processes, so they must be module-level functions.
+GENERATORS = {
+    "backtracker": build_backtracker,
+    "populated": build_populated,
+}
+
+
+def build_maze(width, height, generator):
+    # Forked workers inherit the parent's random state, so reseed or every worker would carve the same mazes
+    random.seed()
+    return GENERATORS[generator](width, height)
+
+
+class MazePool:
+    """
+    Warm pool of ready-made mazes per (width, height, generator) profile.
+
+    `acquire` pops a ready maze in constant time. Whenever a profile drops
+    below `low_water` ready (or in-flight) mazes, the pool asks a
+    ProcessPoolExecutor for enough new ones to get back to `high_water`, so
+    carving, loot placement and population happen off the session-start
+    path. When the pool is empty the maze is built inline and counted as a miss.
+
+    Attributes:
+        ready (dict): Profile -> deque of mazes ready to hand out.
+        pending (dict): Profile -> number of mazes being built.
+        stats (dict): Profile -> hits, misses and refill lags (seconds from request to ready).
+    """
+    def __init__(self, low_water=2, high_water=8, max_workers=None):
+        if not 0 <= low_water <= high_water:
+            raise ValueError("Expected 0 <= low_water <= high_water.")
+        self.low_water = low_water
+        self.high_water = high_water
+        self.executor = ProcessPoolExecutor(max_workers=max_workers)
+        self.ready = defaultdict(deque)
+        self.pending = defaultdict(int)
+        self.stats = defaultdict(lambda: {"hits": 0, "misses": 0, "refill_lags": deque(maxlen=1000)})
+        self.lock = threading.Lock()
+
+    def acquire(self, width, height, generator="backtracker") -> Maze:
+        """Take a maze for a profile, building it inline only if the pool has none ready."""
+        if generator not in GENERATORS:
+            raise ValueError(f"Unknown maze generator '{generator}', expected one of {sorted(GENERATORS)}.")
+        profile = (width, height, generator)
+        try:
+            maze = self.ready[profile].popleft()
+            hit = True
+        except IndexError:
+            maze = None
+            hit = False
+        with self.lock:
+            self.stats[profile]["hits" if hit else "misses"] += 1
+        self.refill(profile)
+        return maze if hit else build_maze(width, height, generator)
+
+    def warm(self, width, height, generator="backtracker"):
+        """Fill a profile up to the high water mark ahead of the first session."""
+        self.refill((width, height, generator), force=True)
+
+    def refill(self, profile, force=False):
+        with self.lock:
+            available = len(self.ready[profile]) + self.pending[profile]
+            if available >= self.low_water and not force:
+                return
+            missing = self.high_water - available
+            self.pending[profile] += max(missing, 0)
+        for _ in range(missing):
+            requested = time.perf_counter()
+            future = self.executor.submit(build_maze, *profile)
+            future.add_done_callback(lambda future, requested=requested: self._built(profile, future, requested))
+
+    def _built(self, profile, future, requested):
+        with self.lock:
+            self.pending[profile] -= 1
+            if future.cancelled():
+                return
+            if future.exception() is not None:
+                logging.error(f"Building a {profile} maze failed: {future.exception()}")
+                return
+            self.stats[profile]["refill_lags"].append(time.perf_counter() - requested)
+        self.ready[profile].append(future.result())
+
+    def report(self):
+        """Hit rate, refill lag and pool levels per profile."""
+        report = {}
+        with self.lock:
+            for profile, stats in self.stats.items():
+                requests = stats["hits"] + stats["misses"]
+                lags = stats["refill_lags"]
+                report["x".join(map(str, profile[:2])) + "/" + profile[2]] = {
+                    "hit_rate": stats["hits"] / requests if requests else None,
+                    "hits": stats["hits"],
+                    "misses": stats["misses"],
+                    "mean_refill_lag_s": sum(lags) / len(lags) if lags else None,
+                    "max_refill_lag_s": max(lags) if lags else None,
+                    "ready": len(self.ready[profile]),
+                    "pending": self.pending[profile],
+                }
+        return report
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,175 @@
+import logging
+import time
+from collections import deque
+
+import numpy as np
+
+from maze.models.maze import Maze
+
+
+######################################
+# Tick-based World Simulation Engine #
+######################################
+
+# Wall bits of a cell in the packed wall bitmask
+WALL_BITS = {"N": 1, "S": 2, "E": 4, "W": 8}
+# Direction index -> (bit, dx, dy), in the order N, S, E, W
+DIRECTION_BITS = np.array([1, 2, 4, 8], dtype=np.uint8)
+DIRECTION_STEPS = np.array([(0, -1), (0, 1), (1, 0), (-1, 0)], dtype=np.int32)
+
+
+def wall_bitmask(maze: Maze) -> np.ndarray:
+    """Pack the walls of every cell into a (width, height) uint8 array, one bit per wall."""
+    walls = np.zeros((maze.width, maze.height), dtype=np.uint8)
+    for x, column in enumerate(maze.maze_grid):
+        for y, cell in enumerate(column):
+            walls[x, y] = sum(bit for side, bit in WALL_BITS.items() if cell.walls[side])
+    # The outer edge is always closed, whatever the cells say
+    walls[:, 0] |= WALL_BITS["N"]
+    walls[:, -1] |= WALL_BITS["S"]
+    walls[-1, :] |= WALL_BITS["E"]
+    walls[0, :] |= WALL_BITS["W"]
+    return walls
+
+
+def shortest_path(maze: Maze, start, goal):
+    """Breadth-first shortest walkable path from start to goal, both ends included."""
+    parents = {start: None}
+    frontier = deque([start])
+    while frontier:
+        current = frontier.popleft()
+        if current == goal:
+            break
+        for neighbour in maze.open_neighbours(*current):
+            if neighbour not in parents:
+                parents[neighbour] = current
+                frontier.append(neighbour)
+    if goal not in parents:
+        raise ValueError(f"No path from {start} to {goal}.")
+    path = []
+    node = goal
+    while node is not None:
+        path.append(node)
+        node = parents[node]
+    return path[::-1]
+
+
+class WorldSimulation:
+    """
+    Advances every simulated NPC of a maze once per tick.
+
+    Positions live in NumPy arrays and a whole tick is a handful of array
+    operations against the packed wall bitmask, so the cost per tick grows
+    with the number of NPCs at C speed rather than through a Python loop per
+    agent. The simulation only knows row numbers; LLM-backed NPC agents are
+    attached with `bind` and copied into the maze's entity index by `sync`.
+
+    Attributes:
+        maze (Maze): The maze being simulated.
+        walls (np.ndarray): (width, height) wall bitmask, see WALL_BITS.
+        wanderers (np.ndarray): (N, 2) positions of NPCs taking a random step each tick.
+        patrol_routes (np.ndarray): (P, L, 2) looping patrol routes, padded to the longest route.
+        patrol_lengths (np.ndarray): (P,) real length of each patrol route.
+        patrol_phase (np.ndarray): (P,) index of each patroller along its route.
+        tick_count (int): Number of ticks simulated so far.
+    """
+    def __init__(self, maze: Maze, seed=None):
+        self.maze = maze
+        self.walls = wall_bitmask(maze)
+        self.rng = np.random.default_rng(seed)
+        self.wanderers = np.empty((0, 2), dtype=np.int32)
+        self.patrol_routes = np.empty((0, 1, 2), dtype=np.int32)
+        self.patrol_lengths = np.empty(0, dtype=np.int32)
+        self.patrol_phase = np.empty(0, dtype=np.int32)
+        self.tick_count = 0
+        self.elapsed = 0.0
+        self.bound = {}  # agent -> ("wanderer" | "patrol", row)
+
+    def spawn_wanderers(self, count, positions=None):
+        """Add `count` wandering NPCs, at the given (count, 2) positions or at random cells. Returns their rows."""
+        if positions is None:
+            positions = np.column_stack((
+                self.rng.integers(0, self.maze.width, count),
+                self.rng.integers(0, self.maze.height, count),
+            ))
+        positions = np.asarray(positions, dtype=np.int32).reshape(count, 2)
+        first = len(self.wanderers)
+        self.wanderers = np.concatenate((self.wanderers, positions))
+        return np.arange(first, first + count)
+
+    def add_patrol(self, waypoints):
+        """Add an NPC walking back and forth along the shortest paths between waypoints. Returns its row."""
+        path = []
+        for start, goal in zip(waypoints, waypoints[1:]):
+            path.extend(shortest_path(self.maze, tuple(start), tuple(goal))[:-1])
+        path.append(tuple(waypoints[-1]))
+        # Walk back the same way, without repeating the turning points
+        route = np.array(path + path[-2:0:-1], dtype=np.int32)
+
+        length = max(self.patrol_routes.shape[1], len(route))
+        routes = np.zeros((len(self.patrol_routes) + 1, length, 2), dtype=np.int32)
+        routes[:-1, :self.patrol_routes.shape[1]] = self.patrol_routes
+        routes[-1, :len(route)] = route
+        self.patrol_routes = routes
+        self.patrol_lengths = np.append(self.patrol_lengths, len(route)).astype(np.int32)
+        self.patrol_phase = np.append(self.patrol_phase, 0).astype(np.int32)
+        return len(self.patrol_lengths) - 1
+
+    def patrol_positions(self):
+        return self.patrol_routes[np.arange(len(self.patrol_phase)), self.patrol_phase]
+
+    def position_of(self, group, row):
+        position = self.wanderers[row] if group == "wanderer" else self.patrol_positions()[row]
+        return int(position[0]), int(position[1])
+
+    def tick(self, ticks=1):
+        """Advance the world by `ticks` ticks."""
+        started = time.perf_counter()
+        for _ in range(ticks):
+            if len(self.wanderers):
+                directions = self.rng.integers(0, 4, len(self.wanderers))
+                cell_walls = self.walls[self.wanderers[:, 0], self.wanderers[:, 1]]
+                open_way = (cell_walls & DIRECTION_BITS[directions]) == 0
+                self.wanderers += DIRECTION_STEPS[directions] * open_way[:, None]
+            if len(self.patrol_phase):
+                self.patrol_phase = (self.patrol_phase + 1) % self.patrol_lengths
+            self.tick_count += 1
+        self.elapsed += time.perf_counter() - started
+
+    @property
+    def ticks_per_second(self):
+        return self.tick_count / self.elapsed if self.elapsed else 0.0
+
+    def bind(self, agent, group, row):
+        """Attach an NPC agent to a simulated row so `sync` moves it in the maze."""
+        if group not in ("wanderer", "patrol"):
+            raise ValueError(f"Unknown NPC group '{group}', expected 'wanderer' or 'patrol'.")
+        self.bound[agent] = (group, row)
+        self.sync()
+
+    def sync(self):
+        """Copy the simulated positions of bound agents into the maze."""
+        for agent, (group, row) in self.bound.items():
+            position = self.position_of(group, row)
+            if agent not in self.maze.entities:
+                self.maze.place_npc(agent, *position)
+            elif self.maze.locate(agent) != position:
+                self.maze.move_entity(agent, *position)
+
+
+def benchmark(npcs=10_000, ticks=1_000, size=100, patrols=100, seed=0):
+    """Simulate `npcs` NPCs (of which `patrols` patrol) in a size x size maze and return ticks/sec."""
+    maze = Maze(size, size)
+    simulation = WorldSimulation(maze, seed=seed)
+    simulation.spawn_wanderers(npcs - patrols)
+    rng = np.random.default_rng(seed)
+    for _ in range(patrols):
+        waypoints = [tuple(int(v) for v in rng.integers(0, size, 2)) for _ in range(3)]
+        simulation.add_patrol(waypoints)
+    simulation.tick(ticks)
+    logging.warning(f"{npcs} NPCs, {ticks} ticks: {simulation.ticks_per_second:.0f} ticks/sec")
+    return simulation.ticks_per_second
+
+
+if __name__ == "__main__":
+    print(f"{benchmark():.0f} ticks/sec at 10k NPCs")
@@ -0,0 +1,175 @@
+import base64
+import json
+from collections import deque
+
+import numpy as np
+
+from maze.controller import MazeController
+from maze.simulation import wall_bitmask
+
+
+######################################
+# Delta-based State Sync for Clients #
+######################################
+
+def encode(message):
+    """Serialize a sync message as compact JSON bytes, the unit its size is measured in."""
+    return json.dumps(message, separators=(",", ":")).encode("utf-8")
+
+
+def pack_walls(maze):
+    """Pack the wall bits of every cell into bytes, two cells (4 bits each) per byte, cell index y * width + x."""
+    bits = wall_bitmask(maze).T.ravel()
+    if len(bits) % 2:
+        bits = np.append(bits, 0).astype(np.uint8)
+    return (bits[0::2] | (bits[1::2] << 4)).tobytes()
+
+
+def entity_id(entity):
+    return getattr(entity, "name", None) or entity.description
+
+
+class StateSyncFeed:
+    """
+    Structured state feed for a web client of one session.
+
+    The client first gets `initial()`: the whole maze as packed wall bits,
+    the explored cells as a bitset and what is known to be in them. After
+    every turn `delta()` returns only what changed: position, newly revealed
+    cells with their contents, entities appearing or disappearing in explored
+    cells and item durability changes. Every message carries a sequence
+    number; a client that missed messages calls `since(seq)` and gets the
+    missing deltas, or a fresh initial message once they are no longer kept.
+
+    Attributes:
+        controller (MazeController): The session being synced.
+        seq (int): Sequence number of the last message produced.
+        history (deque): The most recent deltas, for resync.
+        stats (dict): Bytes sent as deltas against what resending the full state every turn would cost.
+    """
+    HISTORY_SIZE = 64
+
+    def __init__(self, controller: MazeController, measure=True):
+        self.controller = controller
+        self.maze = controller.maze
+        self.cells = self.maze.width * self.maze.height
+        self.measure = measure
+        self.seq = 0
+        self.history = deque(maxlen=self.HISTORY_SIZE)
+        self.stats = {"turns": 0, "delta_bytes": 0, "full_bytes": 0, "initial_bytes": 0}
+        self._position = controller.current_location
+        self._explored = len(controller.fog.explored_order)  # explored cells already sent
+        self._durability = dict(self.maze.item_durability)
+        self._entity_changes = []
+        self.maze.entities.listeners.append(self._on_entity_change)
+
+    def close(self):
+        self.maze.entities.listeners.remove(self._on_entity_change)
+
+    def _on_entity_change(self, change, entity, position, kind):
+        self._entity_changes.append((change, kind, entity_id(entity), position))
+
+    def _cell_contents(self, x, y):
+        contents = {}
+        item = self.maze.get_item(x, y)
+        if item is not None:
+            contents["i"] = [item.name, self.maze.get_item_durability(x, y)]
+        activities = self.maze.get_activities(x, y)
+        if activities:
+            contents["a"] = [activity.description for activity in activities]
+        npcs = self.maze.entities.at((x, y), "npc")
+        if npcs:
+            contents["n"] = [npc.name for npc in npcs]
+        return contents
+
+    def _contents(self, cells):
+        width = self.maze.width
+        contents = {}
+        for x, y in cells:
+            cell = self._cell_contents(x, y)
+            if cell:
+                contents[y * width + x] = cell
+        return contents
+
+    def full_state(self):
+        """The whole client state as of now, as sent on first connect or resync."""
+        return {
+            "t": "init",
+            "seq": self.seq,
+            "w": self.maze.width,
+            "h": self.maze.height,
+            "walls": base64.b64encode(pack_walls(self.maze)).decode("ascii"),
+            "pos": list(self.controller.current_location),
+            "explored": base64.b64encode(self.controller.fog.explored_bytes()).decode("ascii"),
+            "cells": self._contents(self.controller.fog.explored_order),
+        }
+
+    def initial(self):
+        """Start (or restart) the feed with the full state."""
+        message = self.full_state()
+        self._position = self.controller.current_location
+        self._explored = len(self.controller.fog.explored_order)
+        self._durability = dict(self.maze.item_durability)
+        self._entity_changes.clear()
+        self.stats["initial_bytes"] += len(encode(message))
+        return message
+
+    def delta(self):
+        """Return what changed since the previous message, with the next sequence number."""
+        fog = self.controller.fog
+        width = self.maze.width
+        self.seq += 1
+        message = {"t": "d", "seq": self.seq}
+
+        if self.controller.current_location != self._position:
+            self._position = self.controller.current_location
+            message["pos"] = list(self._position)
+
+        revealed = fog.explored_order[self._explored:]
+        if revealed:
+            message["rev"] = sorted(y * width + x for x, y in revealed)
+            contents = self._contents(revealed)
+            if contents:
+                message["cells"] = contents
+        self._explored = len(fog.explored_order)
+        revealed = set(revealed)
+
+        # Entity changes are only news for cells the player already knew; revealed cells came with their contents
+        entities = [
+            [change, kind, name, y * width + x]
+            for change, kind, name, (x, y) in self._entity_changes
+            if fog.is_explored(x, y) and (x, y) not in revealed
+        ]
+        self._entity_changes.clear()
+        if entities:
+            message["ent"] = entities
+
+        durability = self.maze.item_durability
+        changed = [[y * width + x, left] for (x, y), left in durability.items() if self._durability.get((x, y)) != left]
+        if changed:
+            message["dur"] = changed
+            self._durability = dict(durability)
+
+        self.history.append(message)
+        self.stats["turns"] += 1
+        self.stats["delta_bytes"] += len(encode(message))
+        if self.measure:
+            self.stats["full_bytes"] += len(encode(self.full_state()))
+        return message
+
+    def since(self, seq):
+        """Messages a client that last saw `seq` needs to catch up: the missing deltas, or a resync."""
+        if seq == self.seq:
+            return []
+        if self.history and self.history[0]["seq"] <= seq + 1 and seq < self.seq:
+            return [message for message in self.history if message["seq"] > seq]
+        return [self.initial()]
+
+    def report(self):
+        """Average bytes per turn as deltas against resending the full state."""
+        turns = self.stats["turns"] or 1
+        report = {"turns": self.stats["turns"], "delta_bytes_per_turn": self.stats["delta_bytes"] / turns}
+        if self.measure:
+            report["full_bytes_per_turn"] = self.stats["full_bytes"] / turns
+            report["saving"] = 1 - self.stats["delta_bytes"] / max(self.stats["full_bytes"], 1)
+        return report
@@ -0,0 +1,130 @@
+import logging
+import random
+import threading
+import time
+from collections import defaultdict, deque
+
+from maze.controller import MazeController
+from maze.events import EventBroker
+from maze.models.maze import Maze
+
+
+###########################
+# Shared Multiplayer Maze #
+###########################
+
+class SharedMaze:
+    """
+    One maze explored by many players at once.
+
+    Every player gets their own MazeController (position, fog of war) on the
+    shared Maze. A co-location index maps each cell to the players standing
+    in it, and an EventBroker fans move, item and activity events out to the
+    players whose interest area (the cells within `interest_radius` walkable
+    steps of them) contains the cell the event happened in.
+
+    Attributes:
+        maze (Maze): The maze shared by all players.
+        broker (EventBroker): Routes events to interested players, one topic per cell.
+        players (dict): Maps each player ID to their MazeController.
+        occupants (dict): Maps each cell to the set of player IDs standing in it.
+        inboxes (dict): Maps each player ID to their most recent undelivered events.
+        interest_radius (int): How many walkable steps away a player still hears events.
+    """
+    INBOX_SIZE = 50
+
+    def __init__(self, width: int, height: int, npcs: list = [], maze: Maze = None, interest_radius: int = 0):
+        self.maze = maze or Maze(width, height, npcs=npcs)
+        self.broker = EventBroker()
+        self.players = {}
+        self.occupants = defaultdict(set)
+        self.inboxes = {}
+        self.callbacks = {}
+        self.interest_radius = interest_radius
+        self.lock = threading.RLock()
+
+    def join(self, player_id, on_event=None, position=None):
+        """Add a player at `position` (the start point by default) and return their MazeController."""
+        with self.lock:
+            if player_id in self.players:
+                raise ValueError(f"Player '{player_id}' is already in the maze.")
+            controller = MazeController(self.maze.width, self.maze.height, maze=self.maze, world=self, player_id=player_id,
+                                        start=position)
+            self.players[player_id] = controller
+            self.inboxes[player_id] = deque(maxlen=self.INBOX_SIZE)
+            self.callbacks[player_id] = on_event or self.inboxes[player_id].append
+            self.occupants[controller.current_location].add(player_id)
+            self._update_interest(player_id)
+            self.publish("arrive", player_id, controller.current_location)
+            return controller
+
+    def leave(self, player_id):
+        with self.lock:
+            controller = self.players.pop(player_id)
+            position = controller.current_location
+            self._remove_occupant(player_id, position)
+            self.broker.unsubscribe_all(player_id)
+            del self.inboxes[player_id]
+            del self.callbacks[player_id]
+            self.publish("leave", player_id, position)
+
+    def players_at(self, position, exclude=None):
+        """Return the IDs of the players standing in a cell."""
+        return sorted(player_id for player_id in self.occupants.get(position, ()) if player_id != exclude)
+
+    def player_moved(self, player_id, old_position, new_position):
+        """Update the co-location index and interest area of a player and tell the players around both cells."""
+        with self.lock:
+            self._remove_occupant(player_id, old_position)
+            self.occupants[new_position].add(player_id)
+            self._update_interest(player_id)
+            self.publish("leave", player_id, old_position, to=new_position)
+            self.publish("arrive", player_id, new_position, **{"from": old_position})
+
+    def publish(self, kind, player_id, position, **details):
+        """Publish a move, item or activity event that happened in a cell to the players interested in it."""
+        event = {"type": kind, "player": player_id, "position": position, **details}
+        with self.lock:
+            return self.broker.publish(position, event, exclude=player_id)
+
+    def drain(self, player_id):
+        """Return and clear the events a player has received since the last drain."""
+        with self.lock:
+            inbox = self.inboxes[player_id]
+            events = list(inbox)
+            inbox.clear()
+            return events
+
+    def _remove_occupant(self, player_id, position):
+        occupants = self.occupants[position]
+        occupants.discard(player_id)
+        if not occupants:
+            del self.occupants[position]
+
+    def _update_interest(self, player_id):
+        position = self.players[player_id].current_location
+        topics = self.maze.cells_within(position, self.interest_radius) if self.interest_radius else {position}
+        self.broker.resubscribe(player_id, topics, self.callbacks[player_id])
+
+
+def benchmark(players=5_000, moves=20_000, size=100, interest_radius=2):
+    """Move random players around a shared maze and return the mean time to route one move in microseconds."""
+    world = SharedMaze(size, size, interest_radius=interest_radius)
+    for player_id in range(players):
+        # Scatter the players over the maze instead of piling them on the start point
+        world.join(player_id, position=(random.randrange(size), random.randrange(size)))
+    elapsed = 0.0
+    for _ in range(moves):
+        controller = world.players[random.randrange(players)]
+        old_position = controller.current_location
+        controller.current_location = random.choice(world.maze.open_neighbours(*old_position))
+        started = time.perf_counter()
+        world.player_moved(controller.player_id, old_position, controller.current_location)
+        elapsed += time.perf_counter() - started
+    microseconds = elapsed / moves * 1e6
+    logging.warning(f"{players} players: {microseconds:.1f} us per routed move, {world.broker.delivered} deliveries")
+    return microseconds
+
+
+if __name__ == "__main__":
+    print(f"{benchmark():.1f} us per routed move")
@@ -0,0 +1,346 @@
+import argparse
+import json
+import logging
+import os
+import pickle
+import re
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from agents.message_store import MessageStore
+from agents.mock_llm import MOCK_LLM_CONFIG, MockModelClient
+from maze.pool import MazePool
+from maze.sync import StateSyncFeed
+from simple_universe import SaturnChatApp
+
+
+####################################
+# Session Server with LRU Eviction #
+####################################
+
+# Targets: 4,000 resident sessions per GB of memory cap (idle sessions beyond
+# that only cost ~10 KB of disk each) and resuming an evicted session in under
+# 50 ms. `python server.py --benchmark` measures them with the mock LLM; it
+# reports ~130 KB per session after five messages and ~10 ms resumes. The
+# per-session budget leaves room for the HTTP clients of real LLM backends.
+SESSION_BASE_BYTES = 256 * 1024
+# Each message in the in-memory history window is held by the group chat and by every agent that saw
+# it, as one dict per copy around a content string they all share (see agents.message_store)
+HISTORY_COPIES = 4
+MESSAGE_BYTES = 512
+
+
+class SessionManager:
+    """
+    Creates, resumes and drives SaturnChatApp sessions under a memory cap.
+
+    Resident sessions are kept in LRU order. When the estimated memory of the
+    resident sessions goes over `memory_cap_mb`, the least recently used idle
+    sessions are serialized (maze state and chat history, see
+    SaturnChatApp.dehydrate) to `spill_dir` and dropped from memory. The next
+    message for an evicted session rehydrates it transparently. Chat history
+    beyond each session's in-memory window is spilled to `spill_dir/history`.
+    The sequence number of a session's state feed is spilled with it, so its
+    clients never see sequence numbers go backwards.
+
+    Attributes:
+        resident (OrderedDict): Session ID -> SaturnChatApp, least recently used first.
+        sizes (dict): Session ID -> estimated resident bytes.
+        feeds (dict): Session ID -> StateSyncFeed of the resident session.
+        stats (dict): Evictions, rehydrations and the time spent rehydrating.
+    """
+    def __init__(self, spill_dir="./sessions", memory_cap_mb=512, max_rounds=8, app_kwargs=None):
+        self.spill_dir = spill_dir
+        self.memory_cap = memory_cap_mb * 1024 * 1024
+        self.max_rounds = max_rounds
+        self.history_dir = os.path.join(spill_dir, "history")
+        self.app_kwargs = dict({"history_dir": self.history_dir}, **(app_kwargs or {}), interactive=False)
+        self.resident = OrderedDict()
+        self.sizes = {}
+        self.feeds = {}
+        self.lock = threading.RLock()
+        self.session_locks = defaultdict(threading.Lock)
+        self.evicting = set()  # sessions being written to disk, neither resident nor spilled yet
+        self.stats = {"evictions": 0, "rehydrations": 0, "rehydrate_seconds": 0.0}
+        os.makedirs(spill_dir, exist_ok=True)
+
+    def _spill_path(self, session_id):
+        if not re.fullmatch(r"[0-9a-f]{32}", session_id):
+            raise KeyError(session_id)
+        return os.path.join(self.spill_dir, f"{session_id}.session")
+
+    def _session_lock(self, session_id):
+        """The lock serializing requests to a session. Raises KeyError for unknown sessions instead of making a lock."""
+        with self.lock:
+            if (session_id not in self.resident and session_id not in self.evicting
+                    and not os.path.exists(self._spill_path(session_id))):
+                raise KeyError(session_id)
+            return self.session_locks[session_id]
+
+    def _estimate(self, app):
+        messages = app.group_chat.messages
+        history = sum(len(str(message.get("content") or "")) for message in messages)
+        return SESSION_BASE_BYTES + history + HISTORY_COPIES * MESSAGE_BYTES * len(messages)
+
+    def _admit(self, app, sync_seq=0):
+        with self.lock:
+            self.resident[app.session_id] = app
+            self.sizes[app.session_id] = self._estimate(app)
+            feed = self.feeds[app.session_id] = StateSyncFeed(app.rpg_maze, measure=False)
+            # Clients that saw this seq are up to date, older ones get a resync from it
+            feed.seq = sync_seq
+        self._evict_over_cap(keep=app.session_id)
+
+    def _evict_over_cap(self, keep=None):
+        # Victims are picked under the global lock but written out after releasing it, so requests for other
+        # sessions never wait on disk I/O; a victim's own lock holds its requests until it is on disk
+        victims = []
+        with self.lock:
+            excess = sum(self.sizes.values()) - self.memory_cap
+            for session_id in list(self.resident):
+                if excess <= 0:
+                    break
+                if session_id == keep:
+                    continue
+                session_lock = self.session_locks[session_id]
+                if session_lock.acquire(blocking=False):
+                    excess -= self.sizes[session_id]
+                    self.evicting.add(session_id)
+                    victims.append((session_id, session_lock))
+        for session_id, session_lock in victims:
+            try:
+                self.evict(session_id)
+            finally:
+                with self.lock:
+                    self.evicting.discard(session_id)
+                session_lock.release()
+
+    def evict(self, session_id):
+        """Serialize a resident session to disk and drop it from memory."""
+        with self.lock:
+            app = self.resident.pop(session_id)
+            del self.sizes[session_id]
+            feed = self.feeds.pop(session_id)
+            feed.close()
+        path = self._spill_path(session_id)
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump({"app": app.dehydrate(), "sync_seq": feed.seq}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + ".tmp", path)
+        self.stats["evictions"] += 1
+
+    def create(self):
+        app = SaturnChatApp(**self.app_kwargs)
+        self._admit(app)
+        return app
+
+    def get(self, session_id):
+        """Return a session, rehydrating it from disk if it was evicted. Raises KeyError for unknown sessions."""
+        with self.lock:
+            if session_id in self.resident:
+                self.resident.move_to_end(session_id)
+                return self.resident[session_id]
+        path = self._spill_path(session_id)
+        if not os.path.exists(path):
+            raise KeyError(session_id)
+        started = time.perf_counter()
+        with open(path, "rb") as f:
+            spilled = pickle.load(f)
+        app = SaturnChatApp.rehydrate(spilled["app"], **self.app_kwargs)
+        os.remove(path)
+        self.stats["rehydrations"] += 1
+        self.stats["rehydrate_seconds"] += time.perf_counter() - started
+        self._admit(app, spilled["sync_seq"])
+        return app
+
+    def send(self, session_id, message):
+        """Drive one exchange of a session. Returns the new chat messages and the state delta."""
+        with self._session_lock(session_id):
+            app = self.get(session_id)
+            messages = app.handle_message(message, max_rounds=self.max_rounds)
+            with self.lock:
+                self.sizes[session_id] = self._estimate(app)
+                delta = self.feeds[session_id].delta()
+        self._evict_over_cap(keep=session_id)
+        return messages, delta
+
+    def history(self, session_id, start, stop):
+        with self._session_lock(session_id):
+            return self.get(session_id).history(start, stop)
+
+    def state(self, session_id, since):
+        with self._session_lock(session_id):
+            self.get(session_id)
+            return self.feeds[session_id].since(since)
+
+    def delete(self, session_id):
+        with self._session_lock(session_id), self.lock:
+            if session_id in self.resident:
+                del self.resident[session_id]
+                del self.sizes[session_id]
+                self.feeds.pop(session_id).close()
+            elif os.path.exists(self._spill_path(session_id)):
+                os.remove(self._spill_path(session_id))
+            else:
+                raise KeyError(session_id)
+            history = MessageStore.session_path(self.history_dir, session_id)
+            if os.path.exists(history):
+                os.remove(history)
+        self.session_locks.pop(session_id, None)
+
+
+def public_message(message):
+    return {key: message[key] for key in ("name", "role", "content", "tool_calls") if message.get(key) is not None}
+
+
+class SessionRequestHandler(BaseHTTPRequestHandler):
+    """
+    JSON over HTTP:
+        POST   /sessions                      create a session
+        POST   /sessions/<id>/messages        {"message": "..."} -> chat replies and state delta
+        GET    /sessions/<id>/state?since=N   state sync messages after sequence number N
+        GET    /sessions/<id>/history?start=N&stop=M   chat messages N to M (default: all), paged from disk
+        DELETE /sessions/<id>                 end a session
+        GET    /pool                          maze pool hit rate and refill lag
+    """
+    manager: SessionManager = None
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _route(self):
+        parts = [part for part in urlparse(self.path).path.split("/") if part]
+        if not parts or parts[0] != "sessions":
+            raise KeyError(self.path)
+        return parts[1:]
+
+    def do_POST(self):
+        try:
+            parts = self._route()
+            if not parts:
+                app = self.manager.create()
+                body = {"session_id": app.session_id, "intro": app.rpg_maze.intro_maze(),
+                        "state": self.manager.feeds[app.session_id].initial()}
+            elif len(parts) == 2 and parts[1] == "messages":
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if not isinstance(body, dict):
+                    raise ValueError("Expected a JSON object.")
+                message = body.get("message", "")
+                messages, delta = self.manager.send(parts[0], message)
+                body = {"session_id": parts[0], "messages": [public_message(m) for m in messages], "state": delta}
+            else:
+                raise KeyError(self.path)
+            self._reply(200, body)
+        except KeyError:
+            self._reply(404, {"error": "Unknown session or route."})
+        except ValueError as e:  # a malformed number or JSON body
+            self._reply(400, {"error": f"Invalid request: {e}"})
+        except Exception:  # e.g. an LLM backend timing out, the client still gets an answer
+            logging.exception(f"{self.command} {self.path} failed")
+            self._reply(500, {"error": "Internal server error."})
+
+    def do_GET(self):
+        try:
+            if urlparse(self.path).path.rstrip("/") == "/pool":
+                pool = self.manager.app_kwargs.get("maze_pool")
+                self._reply(200, pool.report() if pool else {})
+                return
+            parts = self._route()
+            query = parse_qs(urlparse(self.path).query)
+            if len(parts) == 2 and parts[1] == "history":
+                start = int(query.get("start", ["0"])[0])
+                stop = int(query["stop"][0]) if "stop" in query else None
+                messages = self.manager.history(parts[0], start, stop)
+                self._reply(200, {"session_id": parts[0], "messages": [public_message(m) for m in messages]})
+                return
+            if len(parts) != 2 or parts[1] != "state":
+                raise KeyError(self.path)
+            since = int(query.get("since", ["0"])[0])
+            self._reply(200, {"session_id": parts[0], "state": self.manager.state(parts[0], since)})
+        except KeyError:
+            self._reply(404, {"error": "Unknown session or route."})
+        except ValueError as e:  # a malformed number or JSON body
+            self._reply(400, {"error": f"Invalid request: {e}"})
+        except Exception:  # e.g. an LLM backend timing out, the client still gets an answer
+            logging.exception(f"{self.command} {self.path} failed")
+            self._reply(500, {"error": "Internal server error."})
+
+    def do_DELETE(self):
+        try:
+            parts = self._route()
+            if len(parts) != 1:
+                raise KeyError(self.path)
+            self.manager.delete(parts[0])
+            self._reply(200, {"session_id": parts[0], "deleted": True})
+        except KeyError:
+            self._reply(404, {"error": "Unknown session or route."})
+        except ValueError as e:  # a malformed number or JSON body
+            self._reply(400, {"error": f"Invalid request: {e}"})
+        except Exception:  # e.g. an LLM backend timing out, the client still gets an answer
+            logging.exception(f"{self.command} {self.path} failed")
+            self._reply(500, {"error": "Internal server error."})
+
+
+def benchmark(sessions=20, messages=5, spill_dir="./sessions-benchmark"):
+    """Measure resident memory per session and resume latency with the mock LLM."""
+    manager = SessionManager(spill_dir=spill_dir, memory_cap_mb=1024,
+                             app_kwargs={"llm_config": MOCK_LLM_CONFIG, "model_client_cls": MockModelClient})
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    session_ids = [manager.create().session_id for _ in range(sessions)]
+    for session_id in session_ids:
+        for message in ["hello", "go north", "go east", "go south", "go west"][:messages]:
+            manager.send(session_id, message)
+    per_session = (tracemalloc.get_traced_memory()[0] - before) / sessions
+    tracemalloc.stop()
+    for session_id in session_ids:
+        manager.evict(session_id)
+    spilled = sum(os.path.getsize(manager._spill_path(session_id)) for session_id in session_ids) / sessions
+    for session_id in session_ids:
+        manager.get(session_id)
+    resume_ms = manager.stats["rehydrate_seconds"] / manager.stats["rehydrations"] * 1000
+    report = {
+        "resident_bytes_per_session": int(per_session),
+        "resident_sessions_per_gb": int(1024 ** 3 / per_session),
+        "spilled_bytes_per_session": int(spilled),
+        "resume_ms": round(resume_ms, 2),
+    }
+    for session_id in session_ids:
+        manager.delete(session_id)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve SaturnChatApp sessions over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--memory-cap-mb", type=int, default=512, help="Estimated memory for resident sessions.")
+    parser.add_argument("--spill-dir", default="./sessions", help="Where evicted sessions are serialized.")
+    parser.add_argument("--mock", action="store_true", help="Use the local mock LLM instead of llm_config.json.")
+    parser.add_argument("--pool-low-water", type=int, default=2, help="Refill a maze pool profile below this many mazes.")
+    parser.add_argument("--pool-high-water", type=int, default=0,
+                        help="Mazes to keep ready per profile in a background-filled pool (0 disables the pool).")
+    parser.add_argument("--benchmark", action="store_true", help="Report memory per session and resume latency, then exit.")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        print(json.dumps(benchmark(), indent=2))
+    else:
+        app_kwargs = {"llm_config": MOCK_LLM_CONFIG, "model_client_cls": MockModelClient} if args.mock else {}
+        if args.pool_high_water:
+            app_kwargs["maze_pool"] = MazePool(low_water=min(args.pool_low_water, args.pool_high_water),
+                                               high_water=args.pool_high_water)
+            app_kwargs["maze_pool"].warm(10, 10)
+        SessionRequestHandler.manager = SessionManager(spill_dir=args.spill_dir, memory_cap_mb=args.memory_cap_mb,
+                                                       app_kwargs=app_kwargs)
+        logging.critical(f"Serving sessions on http://{args.host}:{args.port}")
+        ThreadingHTTPServer((args.host, args.port), SessionRequestHandler).serve_forever()
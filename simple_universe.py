@@ -1,12 +1,21 @@
+import io
 import os
 import logging
+import pickle
 import random
 import copy
 from typing import Literal, Union
 import requests
 import json
+import uuid
 from agents import NPC, Legend, SaturnBot
+from agents.message_store import BoundedHistory, ContentInterner, HistoryMap, MessageStore
+from agents.profiler import TurnProfiler
+from agents.tool_budget import ToolResultBudget
+from maze.content import apply_content_pack, load_content_pack
 from maze.controller import MazeController
+from maze.event_log import GameEventLog, dump_controller, load_controller
+from maze.population import populate_maze
 from dotenv import load_dotenv
 
 # Custom imports
@@ -29,33 +38,77 @@ logging.basicConfig(
 
 # In your application initialization
 class SaturnChatApp:
-    def __init__(self, work_dir="./maze"):
+    def __init__(self, work_dir="./maze", session_id=None, world=None, content_pack=None, event_log_dir=None,
+                 llm_config=None, model_client_cls=None, interactive=True, restore_state=None, maze_pool=None,
+                 model_client_kwargs=None, compact_tools=True, tool_token_budget=500, history_dir=None,
+                 history_window=100):
+        self.session_id = session_id or uuid.uuid4().hex
+        # llm_config/model_client_cls swap the LLM backend (e.g. agents.mock_llm); interactive=False ends every
+        # exchange when it is the explorer's turn instead of asking for input, for sessions driven by server.py
+        base_llm_config = gpt4_config if llm_config is None else llm_config
+        # Lore-driven content generated offline by agents.lore_writer, loaded without any LLM calls
+        content = load_content_pack(content_pack) if content_pack else None
         # Instantiate explorer first
         # Agent 1, User proxy agent for the explorer
         self.explorer = UserProxyAgent(
             name="Explorer",
             system_message="Exploring the maze, executing commands for movement.",
-            code_execution_config={"work_dir": work_dir},
+            # Code blocks in replies only run when a human approves them; driven sessions just execute tools
+            code_execution_config={"work_dir": work_dir} if interactive else False,
+            human_input_mode="ALWAYS" if interactive else "NEVER",
         )
         # Agent 2: Guardian
         # Create the NPC with explorer passed as an argument
 
-        guardian_llm_config = copy.deepcopy(gpt4_config)
+        guardian_llm_config = copy.deepcopy(base_llm_config)
 
+        guardian = {
+            "name": "Guardian",
+            "system_message": "I'm a spectral figure that from the shadows.",
+            "backstory": "Guardian of the ancient labyrinth, keeper of its secrets.",
+            "dialogues": ["Welcome, traveler, to the labyrinth of doom.", "Beware the paths that twist and turn.", "Seek the treasure but watch for traps."],
+        }
+        if content and content.get("npcs") and isinstance(content["npcs"][0], dict):
+            guardian.update({key: value for key, value in content["npcs"][0].items() if key in guardian})
         self.guardian_npc = NPC(
-            name="Guardian",
+            name=guardian["name"],
             llm_config=guardian_llm_config,
-            system_message="I'm a spectral figure that from the shadows.",
-            backstory="Guardian of the ancient labyrinth, keeper of its secrets.",
-            dialogues=["Welcome, traveler, to the labyrinth of doom.", "Beware the paths that twist and turn.", "Seek the treasure but watch for traps."],
+            system_message=guardian["system_message"],
+            backstory=guardian["backstory"],
+            dialogues=guardian["dialogues"],
             explorer=self.explorer,
         )
-        # Pass the NPC list to MazeExplorer
-        self.rpg_maze = MazeController(10, 10, npcs=[self.guardian_npc])
+        # Pass the NPC list to MazeExplorer, or join a maze shared with other explorers (a maze.world.SharedMaze)
+        if restore_state is not None:
+            self.rpg_maze = load_controller(io.BytesIO(restore_state["controller"]), npcs=[self.guardian_npc])
+        elif world is not None:
+            self.rpg_maze = world.join(self.session_id)
+            # Every explorer brings their own guardian into the shared maze, placed like Maze.place_npcs places extras
+            world.maze.place_npc(self.guardian_npc, *random.choice(world.maze.get_all_locations()))
+        elif maze_pool is not None:
+            # Take a pre-generated (and, for content packs, pre-populated) maze from a maze.pool.MazePool
+            maze = maze_pool.acquire(10, 10, "populated" if content else "backtracker")
+            if content:
+                apply_content_pack(maze, content)
+            self.rpg_maze = MazeController(10, 10, npcs=[self.guardian_npc], maze=maze)
+        else:
+            self.rpg_maze = MazeController(10, 10, npcs=[self.guardian_npc])
+            if content:
+                apply_content_pack(populate_maze(self.rpg_maze.maze), content)
+        # Terse structured tool results (full detail on request), capped per turn by the tool token budget
+        self.rpg_maze.compact = compact_tools
+        self.tool_budget = ToolResultBudget(tool_token_budget) if tool_token_budget else None
+        # Record every game state change so the session can be restored with GameEventLog.restore
+        if event_log_dir:
+            log_dir = os.path.join(event_log_dir, self.session_id)
+            if restore_state is not None and GameEventLog.snapshot_seqs(log_dir):
+                GameEventLog.resume(log_dir, self.rpg_maze)  # a rehydrated session continues its own log
+            else:
+                GameEventLog.start(log_dir, self.rpg_maze)
         # print(f"Maze created with Guardian NPC. {self.rpg_maze.maze.npcs}")
         # Agent 3
 
-        saturnbot_llm_config = copy.deepcopy(gpt4_config)
+        saturnbot_llm_config = copy.deepcopy(base_llm_config)
 
         self.saturnbot = SaturnBot(
             name="SaturnBot",
@@ -85,11 +138,37 @@ class SaturnChatApp:
 #             self.legends.append(legend)  # Append to the list
             
         self.register_tools() 
+        if self.tool_budget is not None:
+            self.explorer.register_reply([Agent, None], self.tool_budget.reset, position=0)
+        if model_client_cls is not None:
+            for agent in (self.guardian_npc, self.saturnbot):
+                agent.register_model_client(model_client_cls, **(model_client_kwargs or {}))
+        if not interactive:
+            # Lowest priority reply: when the explorer has no tool call to execute, the exchange is over
+            self.explorer.register_reply([Agent, None], SaturnChatApp.end_exchange, position=len(self.explorer._reply_func_list))
+
+        # Per-turn profiling of whole exchanges, switched on per session or sampled (see TurnProfiler.from_env)
+        self.profiler = TurnProfiler.from_env(self.session_id)
+        self.profiler.instrument(self.explorer, self.saturnbot, self.guardian_npc)
+
         self.group_chat = GroupChat([self.explorer, self.saturnbot], [], max_round=1000, speaker_selection_method="round_robin")
         self.initial_group_chat = GroupChat([self.explorer] + [self.saturnbot] + [self.guardian_npc], [], max_round=1000, speaker_selection_method="round_robin")
-        self.group_chat_manager = GroupChatManager(groupchat=self.initial_group_chat)
+        self.group_chat_manager = GroupChatManager(groupchat=self.initial_group_chat,
+                                                   llm_config=False if model_client_cls is not None else None)
 
         self.update_group_chat_participants()  # Initialize group chat participants based on initial NPC locations
+        # Chat histories keep the last `history_window` messages in memory and spill older ones to a
+        # per-session store under history_dir (kept whole in memory without one), sharing contents across agents
+        self.history_store = MessageStore(MessageStore.session_path(history_dir, self.session_id)) if history_dir else None
+        self.interner = ContentInterner()
+        for agent in self.agents():
+            histories = HistoryMap(agent.name, self.history_store, history_window, self.interner)
+            for peer, messages in agent._oai_messages.items():
+                histories[peer] = histories.history(peer.name, messages)
+            agent._oai_messages = histories
+        self.group_chat.messages = BoundedHistory("group_chat", self.history_store, history_window, self.interner)
+        if restore_state is not None:
+            self.restore_history(restore_state["history"])
 
 
 
@@ -123,30 +202,36 @@ class SaturnChatApp:
         trait_text = "\n".join([f"{trait['trait_type']}: {trait['value']}" for trait in traits])
         return trait_text
     
+    def tool_result(self, tool, result):
+        """Count a tool result against the turn's token budget, cutting it down if it doesn't fit."""
+        if self.tool_budget is None:
+            return result
+        return self.tool_budget.apply(tool, result)
+
     def register_tools(self):
         def move_player_wrapper(direction: str) -> str:
             """Wrapper function for moving the player in the RPG maze. Move the player 1 block toward a specific direction, and returns the location of the new block"""
-            return self.rpg_maze.move_player(direction)
+            return self.tool_result("move_player", self.rpg_maze.move_player(direction))
         
-        def get_current_position_wrapper() -> str:
-            position = self.rpg_maze.get_current_position() 
-            return position
+        def get_current_position_wrapper(detail: bool = False) -> str:
+            position = self.rpg_maze.get_current_position(detail) 
+            return self.tool_result("get_current_position", position)
 
-        def display_maze_wrapper() -> str:
-            return self.rpg_maze.display_maze()
+        def display_maze_wrapper(detail: bool = False) -> str:
+            return self.tool_result("display_maze", self.rpg_maze.display_maze(detail))
 
 
-        def get_location_description_wrapper() -> str:
-            return self.rpg_maze.get_location_description()
+        def get_location_description_wrapper(detail: bool = False) -> str:
+            return self.tool_result("get_location_description", self.rpg_maze.look(detail))
         
         def inspect_item_wrapper() -> str:
-            return self.rpg_maze.inspect_item()
+            return self.tool_result("inspect_item", self.rpg_maze.inspect_item())
 
         def use_item_wrapper() -> str:
-            return self.rpg_maze.use_item()
+            return self.tool_result("use_item", self.rpg_maze.use_item())
         
         def interact_with_activity_wrapper() -> str:
-            return self.rpg_maze.interact_with_activity()
+            return self.tool_result("interact_with_activity", self.rpg_maze.interact_with_activity())
         
         register_function(
             move_player_wrapper,
@@ -161,7 +246,7 @@ class SaturnChatApp:
             caller=self.saturnbot,
             executor=self.explorer,
             name="get_current_position",
-            description="Returns the current position of the player. use this when they ask for their coordinates",
+            description="Returns the current position of the player. use this when they ask for their coordinates. Set detail to true for full descriptions of everything here.",
         )
 
         register_function(
@@ -169,7 +254,7 @@ class SaturnChatApp:
             caller=self.saturnbot,
             executor=self.explorer,
             name="display_maze",
-            description="Displays the current state of the maze.",
+            description="Displays the explored maze around the player. Set detail to true for everything explored so far.",
         )
 
         register_function(
@@ -177,7 +262,7 @@ class SaturnChatApp:
             caller=self.saturnbot,
             executor=self.explorer,
             name="get_location_description",
-            description="Returns the description of the current location in the maze. use this when the user is confused about their current location and whats around them.",
+            description="Returns the description of the current location in the maze. use this when the user is confused about their current location and whats around them. Set detail to true for full descriptions of everything here.",
         )
 
         register_function(
@@ -262,29 +347,92 @@ class SaturnChatApp:
         # If none of the above conditions are met, maintain a default or fallback behavior.
         return "round_robin"  # This could be adjusted to return 'None' or a specific default agent.
 
-            
-    
+
+    @staticmethod
+    def end_exchange(recipient, messages=None, sender=None, config=None):
+        return True, None
+
+    def handle_message(self, message, max_rounds=8):
+        """
+        Run one exchange for a message from the player, without blocking on input: the agents (and tools)
+        take turns until it is the explorer's turn again or `max_rounds` is reached.
+        Returns the messages produced by the exchange.
+        """
+        with self.profiler.profile_turn("exchange"):
+            self.update_group_chat_participants()
+            start = self.group_chat.messages.total
+            self.group_chat.max_round = max_rounds
+            self.group_chat_manager.run_chat(
+                messages=[{"content": message, "role": "user", "name": self.explorer.name}],
+                sender=self.explorer,
+                config=self.group_chat,
+            )
+        return self.group_chat.messages.page(start)
+
+    def history(self, start=0, stop=None):
+        """Page through the whole group chat history by position, including messages spilled to disk."""
+        return self.group_chat.messages.page(start, stop)
+
+    def agents(self):
+        return [self.explorer, self.saturnbot, self.guardian_npc, self.group_chat_manager]
+
+    def dehydrate(self):
+        """Serialize the maze state and the chat history of every agent, to rebuild the session with `rehydrate`."""
+        controller = io.BytesIO()
+        dump_controller(self.rpg_maze, controller)
+        # Only the in-memory windows; what was spilled stays in the history store
+        history = {
+            "group_chat": self.group_chat.messages.saved(),
+            "agents": {
+                agent.name: {peer.name: messages.saved() for peer, messages in agent.chat_messages.items()}
+                for agent in self.agents()
+            },
+        }
+        return pickle.dumps({"session_id": self.session_id, "controller": controller.getvalue(), "history": history},
+                            protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def rehydrate(cls, data, **kwargs):
+        """Rebuild a session serialized by `dehydrate`; kwargs are passed to the constructor."""
+        state = pickle.loads(data)
+        return cls(session_id=state["session_id"], restore_state=state, **kwargs)
+
+    def restore_history(self, history):
+        group_chat = history["group_chat"]
+        group_chat = group_chat if isinstance(group_chat, dict) else {"messages": group_chat, "offset": 0}
+        self.group_chat.messages = BoundedHistory("group_chat", self.history_store, self.group_chat.messages.window,
+                                                  self.interner, messages=group_chat["messages"],
+                                                  offset=group_chat["offset"])
+        agents = {agent.name: agent for agent in self.agents()}
+        for agent in self.agents():
+            for peer_name, messages in history["agents"].get(agent.name, {}).items():
+                if peer_name in agents:
+                    agent._oai_messages[agents[peer_name]] = agent._oai_messages.history(peer_name, messages)
+
     def initiate_chat(self, message):
         intro_message = self.rpg_maze.intro_maze()
         self.saturnbot.send(intro_message, self.explorer, request_reply=False)
 
         self.update_group_chat_participants()
 
-        # Create and configure a new GroupChat instance
-        self.group_chat = GroupChat([self.saturnbot, self.explorer] + self.rpg_maze.get_npcs_at_location(), [], max_round=1000, speaker_selection_method='round_robin')
+        # Configure the session's GroupChat, keeping its bounded, interned history (see __init__)
+        self.group_chat.agents = [self.saturnbot, self.explorer] + self.rpg_maze.get_npcs_at_location()
+        self.group_chat.max_round = 1000
 
         # Use the GroupChatManager to handle the chat session
-        self.group_chat_manager.run_chat(
-            config=self.group_chat,
-            sender=self.explorer,  # Assuming the explorer initiates the chat
-            messages=[{"content": message, "role": self.explorer}]
-        )
+        with self.profiler.profile_turn("exchange"):
+            self.group_chat_manager.run_chat(
+                config=self.group_chat,
+                sender=self.explorer,  # Assuming the explorer initiates the chat
+                messages=[{"content": message, "role": self.explorer}]
+            )
 
 
 ############################
 # Run the chat application #
 ############################
 
-maze_app = SaturnChatApp()
-# maze_app.initiate_chat("Hello! Who am I talking to right now? Who is present in this conversation so far?")
-maze_app.initiate_chat("perform the available activity")
+if __name__ == "__main__":
+    maze_app = SaturnChatApp()
+    # maze_app.initiate_chat("Hello! Who am I talking to right now? Who is present in this conversation so far?")
+    maze_app.initiate_chat("perform the available activity")
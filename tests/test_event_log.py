@@ -0,0 +1,19 @@
+import random
+
+from maze.controller import MazeController
+from maze.event_log import GameEventLog
+
+
+def test_restore_cuts_off_a_torn_first_event(tmp_path):
+    random.seed(0)
+    GameEventLog.start(str(tmp_path), MazeController(10, 10)).close()
+    segment = tmp_path / "events-0000000000.log"
+    segment.write_text('["m",1')  # crashed while writing the first event after the snapshot
+
+    controller = GameEventLog.restore(str(tmp_path))
+    controller.record("m", 5, 5)
+    controller.record("m", 6, 6)
+    controller.event_log.close()
+
+    assert segment.read_text() == '["m",5,5]\n["m",6,6]\n'
+    assert GameEventLog.restore(str(tmp_path)).current_location == (6, 6)